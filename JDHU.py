@@ -1,6 +1,27 @@
 # -*- coding: utf-8 -*-
+import errno
+import hashlib
+import marshal
+import multiprocessing
+import operator
+import os
+import re
+import SocketServer
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from cStringIO import StringIO
+from itertools import imap, islice, izip
 from string import letters, digits, whitespace
 
+try:
+    import numpy
+except ImportError:
+    # numpy가 없으면 Vector는 array.array에 값을 두고 python loop로 계산함
+    numpy = None
+
 
 class CuteType:
     INT = 1
@@ -42,6 +63,28 @@ class CuteType:
     BOOLEAN_LIST = (TRUE, FALSE)
 
 
+KEYWORD_TYPES = {
+    'define': CuteType.DEFINE,
+    'lambda': CuteType.LAMBDA,
+    'cond': CuteType.COND,
+    'quote': CuteType.QUOTE,
+    'not': CuteType.NOT,
+    'car': CuteType.CAR,
+    'cdr': CuteType.CDR,
+    'cons': CuteType.CONS,
+    'atom?': CuteType.ATOM_Q,
+    'null?': CuteType.NULL_Q,
+    'eq?': CuteType.EQ_Q,
+    '+': CuteType.PLUS,
+    '-': CuteType.MINUS,
+    '*': CuteType.TIMES,
+    '/': CuteType.DIV,
+    '<': CuteType.LT,
+    '>': CuteType.GT,
+    '=': CuteType.EQ
+}
+
+
 def check_keyword(token):
     """
     :type token:str
@@ -54,19 +97,7 @@ def check_keyword(token):
 
 
 def _get_keyword_type(token):
-    return {
-        'define': CuteType.DEFINE,
-        'lambda': CuteType.LAMBDA,
-        'cond': CuteType.COND,
-        'quote': CuteType.QUOTE,
-        'not': CuteType.NOT,
-        'car': CuteType.CAR,
-        'cdr': CuteType.CDR,
-        'cons': CuteType.CONS,
-        'atom?': CuteType.ATOM_Q,
-        'null?': CuteType.NULL_Q,
-        'eq?': CuteType.EQ_Q
-    }[token]
+    return KEYWORD_TYPES[token]
 
 
 CUTETYPE_NAMES = dict((eval(attr, globals(), CuteType.__dict__), attr) for attr in dir(
@@ -173,7 +204,8 @@ class CuteScanner(object):
         :return:
         """
         self.source = source
-        self._init_TM()
+        if not self.transM:
+            self._init_TM()
 
     def _init_TM(self):
         for alpha in letters:
@@ -187,6 +219,9 @@ class CuteScanner(object):
             self.transM[(4, digit)] = 4
 
         self.transM[(4, '?')] = 16
+        self.transM[(4, '-')] = 4
+        self.transM[(4, '>')] = 4
+        self.transM[(4, '!')] = 4
         self.transM[(0, '-')] = 2
         self.transM[(0, '+')] = 3
         self.transM[(0, '(')] = 5
@@ -210,6 +245,103 @@ class CuteScanner(object):
         cute_scanner = Scanner(self.source)
         return cute_scanner.scan(self.transM, build_token)
 
+    def tokenize_stream(self):
+        """
+        source 전체를 정규식 하나로 훑어서 TokenStream을 만듦.
+        Token 객체를 만들지 않고 종류와 위치만 array에 저장함.
+        :rtype: TokenStream
+        """
+        return scan_source(self.source)
+
+
+# bulk scanner. group 번호가 token 종류를 정함.
+_TOKEN_RE = re.compile(r"""\s*(?:
+    (\()                           # 1 L_PAREN
+    |(\))                          # 2 R_PAREN
+    |(')                           # 3 APOSTROPHE
+    |(-?[0-9]+)(?![^\s()'])         # 4 INT
+    |([A-Za-z][A-Za-z0-9>!-]*\??)   # 5 ID, keyword
+    |(\#[TF])                      # 6 TRUE, FALSE
+    |([-+*/<>=])                   # 7 operator
+    |(\S)                          # 8 error
+)""", re.VERBOSE)
+
+_FIXED_KINDS = {
+    '(': CuteType.L_PAREN,
+    ')': CuteType.R_PAREN,
+    "'": CuteType.APOSTROPHE,
+    '#T': CuteType.TRUE,
+    '#F': CuteType.FALSE,
+    '+': CuteType.PLUS,
+    '-': CuteType.MINUS,
+    '*': CuteType.TIMES,
+    '/': CuteType.DIV,
+    '<': CuteType.LT,
+    '>': CuteType.GT,
+    '=': CuteType.EQ,
+}
+
+
+class TokenStream(object):
+    """
+    scan_source의 결과. i번째 token은 kinds[i] 종류이고
+    source[starts[i]:ends[i]]가 lexeme임.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.kinds = array('H')
+        self.starts = array('l')
+        self.ends = array('l')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def lexeme(self, index):
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def lexemes(self):
+        return imap(self.source.__getslice__, self.starts, self.ends)
+
+    def __iter__(self):
+        """
+        BasicPaser에 넘길 수 있도록 Token을 하나씩 만들어 줌.
+        """
+        source = self.source
+        for kind, start, end in izip(self.kinds, self.starts, self.ends):
+            token = Token.__new__(Token)
+            token.type = kind
+            token.lexeme = source[start:end]
+            yield token
+
+
+def scan_source(source):
+    """
+    :type source: str
+    :rtype: TokenStream
+    """
+    stream = TokenStream(source)
+    kinds = stream.kinds.append
+    starts = stream.starts.append
+    ends = stream.ends.append
+    fixed_kinds = _FIXED_KINDS
+    keyword_types = KEYWORD_TYPES
+
+    for match in _TOKEN_RE.finditer(source):
+        group = match.lastindex
+        start, end = match.span(group)
+        if group == 4:
+            kinds(CuteType.INT)
+        elif group == 5:
+            kinds(keyword_types.get(source[start:end], CuteType.ID))
+        elif group == 8:
+            raise ValueError('unexpected character %r at %d' % (source[start], start))
+        else:
+            kinds(fixed_kinds[source[start:end]])
+        starts(start)
+        ends(end)
+    return stream
+
 
 class TokenType():
     INT = 1
@@ -236,16 +368,25 @@ class TokenType():
     ATOM_Q = 28
     NULL_Q = 29
     EQ_Q = 30
+    PAIR = 31
+    VECTOR = 32
+    PROMISE = 33
+    TABLE = 34
 
 NODETYPE_NAMES = dict((eval(attr, globals(), TokenType.__dict__), attr) for attr in dir(
     TokenType()) if not callable(attr) and not attr.startswith('__'))
 
 class Node (object):
+    __slots__ = ('next', 'value', 'type', 'compiled', 'code', 'addr', 'scope')
 
     def __init__(self, type, value=None):
         self.next = None
         self.value = value
         self.type = type
+        self.compiled = None
+        self.code = None
+        self.addr = None
+        self.scope = None
 
     def set_last_next(self, next_node):
         if self.next is not None:
@@ -255,600 +396,3691 @@ class Node (object):
             self.next = next_node
 
     def __str__(self):
-        result = ''
-
-        if self.type is TokenType.ID:
-            result = '[' + NODETYPE_NAMES[self.type] + ':' + self.value + ']'
-        elif self.type is TokenType.INT:
-            result = '['+NODETYPE_NAMES[self.type]+':' + self.value + ']'
-        elif self.type is TokenType.LIST:
-            if self.value is not None:
-                if self.value.type is TokenType.QUOTE:
-                    result = str(self.value)
+        parts = []
+        # stack에는 출력할 문자열과 아직 출력하지 않은 노드가 거꾸로 쌓임
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.__class__ is str:
+                parts.append(node)
+                continue
+            if node.next is not None:
+                stack.append(node.next)
+                stack.append(' ')
+
+            if node.type is TokenType.ID:
+                parts.append('[' + NODETYPE_NAMES[node.type] + ':' + node.value + ']')
+            elif node.type is TokenType.INT:
+                parts.append('['+NODETYPE_NAMES[node.type]+':' + str(node.value) + ']')
+            elif node.type is TokenType.LIST:
+                if node.value is None:
+                    parts.append('(None)')
+                elif node.value.type is TokenType.QUOTE:
+                    stack.append(node.value)
                 else:
-                    result = '(' + str(self.value) + ')'
+                    parts.append('(')
+                    stack.append(')')
+                    stack.append(node.value)
+            elif node.type is TokenType.QUOTE:
+                parts.append("\'")
             else:
-                result = '(' + str(self.value) + ')'
-        elif self.type is TokenType.QUOTE:
-            result = "\'"
-        else:
-            result = '['+NODETYPE_NAMES[self.type]+']'
+                parts.append('['+NODETYPE_NAMES[node.type]+']')
+        return ''.join(parts)
 
-        # fill out
-        if self.next is not None:
-            return result + ' ' + str(self.next)
-        else:
-            return result
+    def lookupTable(self, global_env):
+        """
+        :type global_env: KeywordTable
+        """
+        binding = global_env.table.get(self.value)
+        if binding is not None:
+            return binding.value
+        return None
+
+class KeywordTable(object):########
+    """
+    global 환경. Interpreter마다 하나씩 가지고 Frame.global_env로 찾음.
+    """
+
+    def __init__(self):
+        # intern된 이름 -> Binding. define 수와 상관없이 한번에 찾음.
+        self.table = {}
+        # 호출 위치 inline cache의 적중/실패 횟수
+        self.call_cache_stats = {'hits': 0, 'misses': 0}
+        # 이름 -> define-memo로 만든 MemoCache
+        self.memo_caches = {}
+        # global 이름 -> 그 이름을 참조하는 MemoCache들. 이름이 define되면 cache를 비움
+        self.memo_dependents = {}
+        # 지금 평가에 걸린 StepBudget. None이면 제한 없음
+        self.budget = None
+        # tiered 실행의 JitCompiler. None이면 tree 엔진이 그대로 실행함
+        self.jit = None
+
+
+class EvaluationLimitError(Exception):
+    """
+    StepBudget의 호출 수나 시간을 넘어서 평가를 멈춤.
+    """
 
-    def lookupTable(self):
-        if self.value in KeywordTable.table.keys():
-            return KeywordTable.table.get(self.value)
 
-    def lookupTemp(self):
-        if self.value in KeywordTable.temptable.keys():
-            return KeywordTable.temptable.get(self.value)
+class StepBudget(object):
+    """
+    평가 하나에 허용하는 lambda 호출 수와 시간. make_frame이 호출마다 charge를 부름.
+    tail call로 도는 loop도 호출마다 Frame을 만드므로 같이 세어짐.
+    """
+    # 시간은 이 호출 수마다 한번씩만 확인함
+    CHECK_INTERVAL = 1024
+
+    def __init__(self, steps=None, timeout=None):
+        """
+        :param steps: 최대 호출 수. None이면 제한 없음
+        :param timeout: 최대 초. None이면 제한 없음
+        """
+        self.steps = steps
+        self.deadline = time.time() + timeout if timeout is not None else None
+        self.count = 0
+
+    def charge(self):
+        self.count += 1
+        if self.steps is not None and self.count > self.steps:
+            raise EvaluationLimitError('step budget of %d exceeded' % self.steps)
+        if self.deadline is not None and self.count % self.CHECK_INTERVAL == 0 \
+                and time.time() > self.deadline:
+            raise EvaluationLimitError('timeout')
+
+
+class Binding(object):
+    """
+    global 이름 하나의 값. 이미 있는 이름을 다시 define하면 version이 올라감.
+    """
+    __slots__ = ('value', 'version')
+
+    def __init__(self, value):
+        self.value = value
+        self.version = 0
+
+
+class Pair(object):
+    """
+    list 값의 cons cell. 만든 뒤에는 바꾸지 않으므로 cons는 cdr 쪽 list를 복사 없이 공유함.
+    """
+    __slots__ = ('car', 'cdr')
+    type = TokenType.PAIR
+
+    def __init__(self, car, cdr):
+        """
+        :type car: Node
+        :param car: 원소. atom 노드 또는 Pair
+        :type cdr: Pair
+        """
+        self.car = car
+        self.cdr = cdr
+
+
+class Vector(object):
+    """
+    숫자 vector 값. numpy가 있으면 numpy 배열, 없으면 array.array에 원소들을 가짐.
+    value가 없으므로 산술 primitive는 AttributeError가 나면 vector 연산으로 계산함.
+    """
+    __slots__ = ('items', 'boolean')
+    type = TokenType.VECTOR
+
+    def __init__(self, items, boolean=False):
+        """
+        :param items: 원소 배열
+        :param boolean: 원소가 #T, #F인 비교 결과 vector인지
+        """
+        self.items = items
+        self.boolean = boolean
 
-class KeywordTable(object):########
-    table = {}
-    temptable = {}
+
+class Promise(object):
+    """
+    delay로 만든 값. 처음 force할 때 thunk를 불러 결과를 value에 저장함.
+    저장한 뒤에는 thunk를 버려서 식이 참조하던 Frame도 놓아줌.
+    """
+    __slots__ = ('thunk', 'value')
+    type = TokenType.PROMISE
+
+    def __init__(self, thunk):
+        """
+        :param thunk: 인자 없이 불러서 값 노드를 반환하는 함수
+        """
+        self.thunk = thunk
+        self.value = None
+
+
+class Table(object):
+    """
+    숫자나 이름을 key로 쓰는 hash table 값. table-set!으로 바뀜.
+    """
+    __slots__ = ('items',)
+    type = TokenType.TABLE
+
+    def __init__(self):
+        # key의 python 값 -> (key 노드, 값 노드)
+        self.items = {}
+
+
+# 계산 결과로 나오는 #T, #F, '( )는 새로 만들지 않고 이 값들을 같이 씀.
+# 공유되는 노드이므로 next를 바꾸면 안 됨.
+TRUE_NODE = Node(TokenType.TRUE)
+FALSE_NODE = Node(TokenType.FALSE)
+EMPTY_LIST = Pair(None, None)
+
+
+class Frame(object):
+    """
+    lambda 호출 하나의 변수들. 변수는 resolve_lambda가 정한 slot 번호로 찾음.
+    """
+    __slots__ = ('values', 'parent', 'global_env')
+
+    def __init__(self, values, parent=None, global_env=None):
+        """
+        :type values: list
+        :type parent: Frame
+        :param global_env: parent가 없는 top level Frame의 global 환경. 나머지는 parent 것을 씀
+        """
+        self.values = values
+        self.parent = parent
+        if parent is not None:
+            global_env = parent.global_env
+        self.global_env = global_env
+
+
+# Interpreter를 따로 만들지 않고 run_expr 등을 부를 때 쓰는 top level Frame
+GLOBAL_FRAME = Frame([], None, KeywordTable())
+
+
+class Closure(Node):
+    """
+    lambda를 평가한 값. lambda list 노드처럼 출력되고 만들어질 때의 Frame을 가짐.
+    """
+    __slots__ = ('env',)
+
+    def __init__(self, node, env):
+        """
+        :type node: Node
+        :param node: (lambda (...) ...) list 노드
+        :type env: Frame
+        """
+        Node.__init__(self, TokenType.LIST, node.value)
+        self.env = env
 
 class BasicPaser(object):
 
     def __init__(self, token_list):
         """
-        :type token_list:list
+        :type token_list:list or TokenStream
         :param token_list:
         :return:
         """
-        self.token_iter = iter(token_list)
+        if isinstance(token_list, TokenStream):
+            self.token_iter = izip(token_list.kinds, token_list.lexemes())
+        else:
+            self.token_iter = ((token.type, token.lexeme) for token in token_list)
 
     def _get_next_token(self):
         """
-        :rtype: Token
-        :return:
+        :rtype: tuple
+        :return: (type, lexeme). token이 없으면 None
         """
-        next_token = next(self.token_iter, None)
-        if next_token is None:
-            return None
-        return next_token
+        return next(self.token_iter, None)
 
     def parse_expr(self):
         """
+        재귀 대신 아직 닫히지 않은 list와 quote를 stack에 쌓아서 parse함.
+        list 길이나 중첩 깊이에 상관없이 python stack을 쓰지 않음.
         :rtype : Node
         :return:
         """
-        token = self._get_next_token()
-
-        '"":type :Token""'
-        if token is None:
+        # stack의 각 항목은 [list 노드, 마지막 원소]. quote는 마지막 원소가 _QUOTE_MARK
+        stack = []
+        while True:
+            token = self._get_next_token()
+            if token is None:
+                node = None
+            else:
+                token_type, lexeme = token
+                if token_type is CuteType.L_PAREN:
+                    stack.append([Node(TokenType.LIST), None])
+                    continue
+                if token_type is CuteType.APOSTROPHE:
+                    stack.append([Node(TokenType.LIST, Node(TokenType.QUOTE, lexeme)),
+                                  _QUOTE_MARK])
+                    continue
+                node = self._create_node(token_type, lexeme)
+
+            # node(None이면 list의 끝)를 열려 있는 list나 quote에 붙임.
+            while stack:
+                list_node, last_node = top = stack[-1]
+                if last_node is _QUOTE_MARK:
+                    list_node.value.next = node
+                elif node is None:
+                    pass
+                else:
+                    if last_node is None:
+                        list_node.value = node
+                    else:
+                        last_node.next = node
+                    top[1] = node
+                    break
+                stack.pop()
+                node = list_node
+            else:
+                return node
+
+    def _create_node(self, token_type, lexeme):
+        if token_type is CuteType.INT:
+            return Node(TokenType.INT, int(lexeme))
+        elif token_type is CuteType.ID:
+            # 같은 이름은 같은 문자열 객체가 되어 global table에서 비교 없이 찾아짐
+            return Node(TokenType.ID, intern(lexeme))
+        elif token_type is CuteType.R_PAREN:
             return None
-        result = self._create_node(token)
-        return result
+        elif token_type in CuteType.BOOLEAN_LIST:
+            return Node(token_type)
+        elif token_type in CuteType.BINARYOP_LIST:
+            return Node(token_type, lexeme)
+        elif token_type is CuteType.QUOTE:
+            return Node(TokenType.QUOTE, lexeme)
+        elif check_keyword(lexeme):
+            return Node(token_type, lexeme)
+
+
+_QUOTE_MARK = object()
+
+
+def resolve_lambda(lambda_node, scopes=()):
+    """
+    lambda body 안의 변수 노드마다 (depth, slot) 주소를 addr에 붙임.
+    depth는 몇 번째 바깥 Frame인지, slot은 Frame.values의 index.
+    주소가 없는 변수는 global 환경(Frame.global_env)에서 찾음.
+    lambda 하나에 한번만 실행되고 안쪽 lambda들도 같이 처리됨.
+    :param lambda_node: lambda keyword 노드
+    :param scopes: 바깥 lambda들의 변수 이름 tuple들. 안쪽일수록 뒤
+    :return: (인자 이름들, body 안에서 define한 이름들)
+    """
+    if lambda_node.scope is not None:
+        return lambda_node.scope
+
+    params_node = lambda_node.next
+    params = []
+    variable = params_node.value
+    while variable is not None:
+        params.append(variable.value)
+        variable = variable.next
+
+    local_names = []
+    body_node = params_node.next
+    while body_node is not None:
+        if body_node.type is TokenType.LIST and body_node.value is not None \
+                and body_node.value.type is TokenType.DEFINE:
+            name = body_node.value.next.value
+            if name not in params and name not in local_names:
+                local_names.append(name)
+        body_node = body_node.next
+
+    scopes = scopes + (tuple(params + local_names),)
+    body_node = params_node.next
+    while body_node is not None:
+        _resolve(body_node, scopes)
+        body_node = body_node.next
+    # 다른 thread가 addr를 다 붙이기 전의 body를 실행하지 않도록 scope는 마지막에 붙임
+    lambda_node.scope = (tuple(params), tuple(local_names))
+    return lambda_node.scope
+
+
+def _find_addr(name, scopes):
+    depth = 0
+    for names in reversed(scopes):
+        if name in names:
+            return depth, names.index(name)
+        depth += 1
+    return None
 
-    def _create_node(self, token):
-        if token is None:
-            return None
-        elif token.type is CuteType.INT:
-            return Node(TokenType.INT,  token.lexeme)
-        elif token.type is CuteType.ID:
-            return Node(TokenType.ID,   token.lexeme)
-        elif token.type is CuteType.L_PAREN:
-            return Node(TokenType.LIST, self._parse_expr_list())
-        elif token.type is CuteType.R_PAREN:
-            return None
-        elif token.type in CuteType.BOOLEAN_LIST:
-            return Node(token.type)
-        elif token.type in CuteType.BINARYOP_LIST:
-            return Node(token.type, token.lexeme)
-        elif token.type is CuteType.QUOTE:
-            return Node(TokenType.QUOTE, token.lexeme)
-        elif token.type is CuteType.APOSTROPHE:
-            node = Node(TokenType.LIST, Node(TokenType.QUOTE, token.lexeme))
-            node.value.next = self.parse_expr()
-            return node
-        elif check_keyword(token.lexeme):
-            return Node(token.type, token.lexeme)
 
-    def _parse_expr_list(self):
-        head = self.parse_expr()
-        '"":type :Node""'
-        if head is not None:
-            head.next = self._parse_expr_list()
-        return head
+def _resolve(node, scopes):
+    if node.type is TokenType.ID:
+        node.addr = _find_addr(node.value, scopes)
+        return
+    if node.type is not TokenType.LIST or node.value is None:
+        return
+
+    op_code_node = node.value
+    if op_code_node.type is TokenType.QUOTE:
+        return
+    if op_code_node.type is TokenType.LAMBDA:
+        resolve_lambda(op_code_node, scopes)
+        return
+    if op_code_node.type is TokenType.DEFINE:
+        op_code_node.next.addr = _find_addr(op_code_node.next.value, scopes)
+        op_code_node = op_code_node.next.next
+    while op_code_node is not None:
+        _resolve(op_code_node, scopes)
+        op_code_node = op_code_node.next
+
+
+def lookup_env(env, addr):
+    depth, slot = addr
+    while depth:
+        env = env.parent
+        depth -= 1
+    return env.values[slot]
+
+
+def store_env(env, addr, value):
+    depth, slot = addr
+    while depth:
+        env = env.parent
+        depth -= 1
+    env.values[slot] = value
+
+
+def make_frame(func_node, args):
+    """
+    closure를 args로 호출할 Frame을 만듦. closure가 아니면 KeyError.
+    :type func_node: Closure
+    :type args: list
+    """
+    if not isinstance(func_node, Closure):
+        raise KeyError(print_node(func_node) if func_node is not None else None)
+    params, local_names = func_node.value.scope
+    if len(args) != len(params):
+        args = (list(args) + [None] * len(params))[:len(params)]
+    if local_names:
+        args = args + [None] * len(local_names)
+    env = func_node.env
+    if env.global_env.budget is not None:
+        env.global_env.budget.charge()
+    return Frame(args, env)
+
+
+def lambda_body(func_node):
+    """
+    :type func_node: Closure
+    :return: body의 첫번째 노드. 나머지는 next로 이어짐
+    """
+    return func_node.value.next.next
 
 
-def run_list(root_node):
+def run_list(root_node, env=None):
     """
     :type root_node: Node
+    :type env: Frame
     """
     op_code_node = root_node.value
 
-    return run_func(op_code_node)(root_node)
+    return run_func(op_code_node)(root_node, env)
 
 
 def run_func(op_code_node):
     """
-    :type op_code_node:Node/
+    op_code_node의 type으로 DISPATCH_TABLE에서 실행할 함수를 찾음.
+    table은 모듈 로드시 한번만 만들어짐.
+    :type op_code_node:Node
     """
-    def quote(node):
-        return node
+    func = DISPATCH_TABLE.get(op_code_node.type)
+    if func is None:
+        raise KeyError(op_code_node.value)
+    return func
 
-    def strip_quote(node):
-        """
-        :type node: Node
-        """
-        if node.type is TokenType.LIST:
-            if node.value is TokenType.QUOTE or TokenType.APOSTROPHE:
-                return node.value.next
-        if node.type is TokenType.QUOTE:
-            return node.next
-        return node
 
-    def cons(node):
-        """
-        :type node: Node
-        """
-        l_node = node.value.next
-        r_node = l_node.next
-        r_node = run_expr(r_node)
-        l_node = run_expr(l_node)
-        new_r_node = r_node
-        new_l_node = l_node
-        new_r_node = strip_quote(new_r_node)
-        new_l_node = strip_quote(new_l_node)
-        new_l_node.next = new_r_node.value
-
-        return create_new_quote_list(new_l_node, True)
-
-    def car(node):
-        l_node = run_expr(node.value.next)
-        result = strip_quote(l_node).value
-        if result.type is not TokenType.LIST:
-            return result
-        return create_new_quote_list(result)
+def strip_quote(node):
+    """
+    :type node: Node
+    """
+    # quote된 list만 벗김. closure도 LIST 노드지만 lambda로 시작하므로 그대로 둠
+    if node.type is TokenType.LIST:
+        if node.value is not None and node.value.type is TokenType.QUOTE:
+            return node.value.next
+    if node.type is TokenType.QUOTE:
+        return node.next
+    return node
 
-    def cdr(node):
-        """
-        :type node: Node
-        """
-        l_node = node.value.next
-        l_node = run_expr(l_node)
-        new_r_node = strip_quote(l_node)
-        return create_new_quote_list(new_r_node.value.next, True)
-
-    def null_q(node):
-        l_node = run_expr(node.value.next)
-        new_l_node = strip_quote(l_node).value
-        if new_l_node is None:
-            return Node(TokenType.TRUE)
+
+def quoted_value(node):
+    """
+    quote form의 값. list는 Pair로 바꾸고, 결과는 quote 노드의 compiled에 저장해 한번만 바꿈.
+    list가 아닌 것은 지금처럼 quote form 그대로 값이 됨.
+    :type node: Node
+    :param node: (quote ...) list 노드
+    """
+    quote_node = node.value
+    if quote_node.compiled is None:
+        datum = quote_node.next
+        if datum is not None and datum.type is TokenType.LIST and not _is_quote_form(datum):
+            quote_node.compiled = list_to_pairs(datum)
         else:
-            return Node(TokenType.FALSE)
+            quote_node.compiled = node
+    return quote_node.compiled
+
 
-    def atom_q(node):
-        l_node = run_expr(node.value.next)
-        new_l_node = strip_quote(l_node)
+def _is_quote_form(node):
+    return node.value is not None and node.value.type is TokenType.QUOTE
 
-        if new_l_node.type is TokenType.LIST:
-            if new_l_node.value is None:
-                return Node(TokenType.TRUE)
-            return Node(TokenType.FALSE)
+
+def list_to_pairs(list_node):
+    """
+    parser가 만든 list 노드를 Pair들로 바꿈. 안쪽 list도 Pair가 되고 atom 노드는 그대로 씀.
+    깊게 중첩된 list도 python 재귀 없이 stack으로 바꿈.
+    :type list_node: Node
+    :rtype: Pair
+    """
+    # stack의 각 항목은 [다음에 볼 원소, 바꾼 원소들]
+    stack = [[list_node.value, []]]
+    while True:
+        entry = stack[-1]
+        element = entry[0]
+        if element is None:
+            stack.pop()
+            value = EMPTY_LIST
+            for item in reversed(entry[1]):
+                value = Pair(item, value)
+            if not stack:
+                return value
+            stack[-1][1].append(value)
+            continue
+        entry[0] = element.next
+        if element.type is TokenType.LIST and not _is_quote_form(element):
+            stack.append([element.value, []])
         else:
-            return Node(TokenType.TRUE)
+            entry[1].append(element)
 
-    def eq_q(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
-
-        if (new_l_node.type or new_r_node.type) is not TokenType.INT:
-            return Node(TokenType.FALSE)
-        if new_l_node.value == new_r_node.value:
-            return Node(TokenType.TRUE)
-        return Node(TokenType.FALSE)
-
-    # Fill Out
-    # table을 보고 함수를 작성하시오
-    def not_op(node):
-        l_node = node.value.next
-        new_l_node = strip_quote(run_expr(l_node))
 
-        if new_l_node.type is TokenType.FALSE:
-            return Node(TokenType.TRUE)
-        return Node(TokenType.FALSE)
+def bool_node(value):
+    if value is True:
+        return TRUE_NODE
+    return FALSE_NODE
 
-    def plus(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
 
-        result = int(new_l_node.value) + int(new_r_node.value)
+# primitive 함수들은 run_expr, strip_quote를 거친 인자 노드들을 받음.
 
-        return Node(TokenType.INT, result)
+def cons(l_node, r_node):
+    return Pair(l_node, r_node)
 
-    def minus(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
 
-        result = int(new_l_node.value) - int(new_r_node.value)
+def car(l_node):
+    return l_node.car
 
-        return Node(TokenType.INT, result)
 
-    def multiple(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
+def cdr(l_node):
+    return l_node.cdr
 
-        result = int(new_l_node.value) * int(new_r_node.value)
 
-        return Node(TokenType.INT, result)
+def null_q(l_node):
+    return bool_node(l_node is EMPTY_LIST)
 
-    def divide(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
 
-        result = int(new_l_node.value) / int(new_r_node.value)
+def atom_q(l_node):
+    if l_node.type is TokenType.VECTOR or l_node.type is TokenType.TABLE:
+        return FALSE_NODE
+    return bool_node(l_node.type is not TokenType.PAIR or l_node is EMPTY_LIST)
 
-        return Node(TokenType.INT, result)
 
-    def lt(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
+def eq_q(l_node, r_node):
+    # vector와 table은 같은 객체인지 비교함 (한 쪽만 vector나 table이어도)
+    if l_node.type in (TokenType.VECTOR, TokenType.TABLE) \
+            or r_node.type in (TokenType.VECTOR, TokenType.TABLE):
+        return bool_node(l_node is r_node)
+    if l_node.type is not TokenType.INT or r_node.type is not TokenType.INT:
+        return FALSE_NODE
+    return bool_node(l_node.value == r_node.value)
 
-        result = int(new_l_node.value) < int(new_r_node.value)
-        if result is True:
-            return Node(TokenType.TRUE)
-        return Node(TokenType.FALSE)
 
-    def gt(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
+def not_op(l_node):
+    return bool_node(l_node.type is TokenType.FALSE)
 
-        result = int(new_l_node.value) > int(new_r_node.value)
-        if result is True:
-            return Node(TokenType.TRUE)
-        return Node(TokenType.FALSE)
 
-    def eq(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_l_node = strip_quote(run_expr(l_node))
-        new_r_node = strip_quote(run_expr(r_node))
+def plus(l_node, r_node):
+    try:
+        return Node(TokenType.INT, l_node.value + r_node.value)
+    except AttributeError:
+        return vector_binary('add', l_node, r_node)
 
-        result = int(new_l_node.value) == int(new_r_node.value)
-        if result is True:
-            return Node(TokenType.TRUE)
-        return Node(TokenType.FALSE)
 
-    def cond(node):
-        l_node = node.value.next
+def minus(l_node, r_node):
+    try:
+        return Node(TokenType.INT, l_node.value - r_node.value)
+    except AttributeError:
+        return vector_binary('sub', l_node, r_node)
 
-        if l_node is not None:
-            return run_cond(l_node)
-        else:
-            print('cond null error!')
 
-    def define(node):
-        l_node = node.value.next
-        r_node = l_node.next
-        new_r_node = run_expr(r_node)
+def multiple(l_node, r_node):
+    try:
+        return Node(TokenType.INT, l_node.value * r_node.value)
+    except AttributeError:
+        return vector_binary('mul', l_node, r_node)
 
-        return insert_table(l_node.value, new_r_node)
 
-    def lamda(node):
-        l_node = node.value.next # table 에 넣어서 사용.
-        r_node = l_node.next
+def divide(l_node, r_node):
+    try:
+        return Node(TokenType.INT, l_node.value / r_node.value)
+    except AttributeError:
+        return vector_binary('div', l_node, r_node)
 
-        if node.next is None:
-            return node
 
-        if r_node.value.type is TokenType.DEFINE:
-            lamda_l_node = r_node.value.next
-            lamda_r_node = lamda_l_node.next
-            new_r_node = run_expr(lamda_r_node)
-            KeywordTable.temptable[lamda_l_node.value] = new_r_node
-            node.value.next.next = node.value.next.next.next
+def lt(l_node, r_node):
+    try:
+        return bool_node(l_node.value < r_node.value)
+    except AttributeError:
+        return vector_binary('lt', l_node, r_node)
 
-        l_node = node.value.next # table 에 넣어서 사용.
-        r_node = l_node.next
 
-        variable = l_node.value
-        var_value = node.next
+def gt(l_node, r_node):
+    try:
+        return bool_node(l_node.value > r_node.value)
+    except AttributeError:
+        return vector_binary('gt', l_node, r_node)
 
-        while variable is not None:
-            temp_value = run_expr(var_value)
-            KeywordTable.temptable[variable.value] = temp_value
 
-            variable = variable.next
-            var_value = var_value.next
-        result = run_expr(r_node)
+def eq(l_node, r_node):
+    try:
+        return bool_node(l_node.value == r_node.value)
+    except AttributeError:
+        return vector_binary('eq', l_node, r_node)
 
-        return result
 
-    def insert_table(id, value):
-        if id in KeywordTable.temptable.keys():
-            return
-        KeywordTable.table[id] = value
-        return KeywordTable.table.get(id)
+# special form 함수들은 인자를 평가하지 않은 list 노드 전체와 현재 Frame을 받음.
 
-    def run_cond(node):
-        """
-        :type node: Node
-        """
-        #Fill Out
-        # 값을 미리 저장해두자.. 계속 값이 사라지네..
-        result = node.value.next
+def quote(node, env):
+    return quoted_value(node)
+
+
+def cond(node, env):
+    l_node = node.value.next
+
+    if l_node is not None:
+        return run_cond(l_node, env)
+    else:
+        print('cond null error!')
+
+
+def define(node, env):
+    l_node = node.value.next
+    r_node = l_node.next
+    new_r_node = run_expr(r_node, env)
+
+    if l_node.addr is not None:
+        store_env(env, l_node.addr, new_r_node)
+        return new_r_node
+    return insert_table(l_node.value, new_r_node, env.global_env)
+
+
+def lamda(node, env):
+    resolve_lambda(node.value)
+    return Closure(node, env)
+
+
+def insert_table(id, value, global_env=None):
+    """
+    :param global_env: define할 global 환경. None이면 GLOBAL_FRAME의 것
+    """
+    if global_env is None:
+        global_env = GLOBAL_FRAME.global_env
+    binding = global_env.table.get(id)
+    if binding is None:
+        global_env.table[intern(id)] = Binding(value)
+    else:
+        binding.value = value
+        binding.version += 1
+    if id in global_env.memo_dependents:
+        invalidate_memo(id, global_env)
+    if global_env.jit is not None and id in global_env.jit.dependents:
+        global_env.jit.invalidate(id)
+    return value
+
+
+def lookup_callee(head_node, global_env):
+    """
+    global 함수를 부르는 호출 위치의 head ID 노드로 함수 값을 찾음.
+    찾은 Binding, version, 값을 head 노드의 compiled에 두고
+    define으로 version이 바뀌기 전까지는 table을 찾지 않음.
+    AST는 Interpreter끼리 같이 쓸 수 있으므로 cache는 만든 global 환경에서만 씀.
+    :type head_node: Node
+    :type global_env: KeywordTable
+    """
+    cache = head_node.compiled
+    if cache is not None and cache[0] is global_env and cache[1].version == cache[2]:
+        global_env.call_cache_stats['hits'] += 1
+        return cache[3]
+    global_env.call_cache_stats['misses'] += 1
+    binding = global_env.table.get(head_node.value)
+    if binding is None:
+        return head_node
+    head_node.compiled = (global_env, binding, binding.version, binding.value)
+    return binding.value
+
+
+def run_cond(node, env):
+    """
+    :type node: Node
+    """
+    return run_expr(select_cond(node, env), env)
+
+
+def select_cond(node, env):
+    """
+    test가 #T인 첫번째 clause의 실행할 노드를 반환함. 실행은 하지 않음.
+    :type node: Node
+    :param node: 첫번째 clause 노드
+    """
+    while node is not None:
         if node.value.type is TokenType.LIST:
-            cond_node = run_expr(node.value)
+            cond_node = run_expr(node.value, env)
         else:
             cond_node = node.value
 
-        if cond_node.type is not TokenType.TRUE and cond_node.type is not TokenType.FALSE:
+        if cond_node.type is TokenType.TRUE:
+            return node.value.next
+        if cond_node.type is not TokenType.FALSE:
             print "Type Error!"
-            return
+            return None
+        node = node.next
+    return None
 
-        if cond_node.type is TokenType.FALSE:
-            return run_cond(node.next)
-        else:
-            return run_expr(node.value.next)
 
-    def create_new_quote_list(value_node, list_flag=False):
-        """
-        :type value_node: Node
-        """
-        quote_list = Node(TokenType.QUOTE, 'quote')
-        wrapper_new_list = Node(TokenType.LIST, quote_list)
-        if value_node is None:
-            pass
-        elif value_node.type is TokenType.LIST:
-            if list_flag:
-                inner_l_node = Node(TokenType.LIST, value_node)
-                quote_list.next = inner_l_node
-            else:
-                quote_list.next = value_node
-            return wrapper_new_list
-        new_value_list = Node(TokenType.LIST, value_node)
-        quote_list.next = new_value_list
-        return wrapper_new_list
-
-    table = {}
-    table['cons'] = cons
-    table["'"] = quote
-    table['quote'] = quote
-    table['cdr'] = cdr
-    table['car'] = car
-    table['eq?'] = eq_q
-    table['null?'] = null_q
-    table['atom?'] = atom_q
-    table['not'] = not_op
-    table['+'] = plus
-    table['-'] = minus
-    table['*'] = multiple
-    table['/'] = divide
-    table['<'] = lt
-    table['>'] = gt
-    table['='] = eq
-    table['cond'] = cond
-    table['define'] = define
-    table['lambda'] = lamda
-
-    return table[op_code_node.value]
-
-
-def run_expr(root_node):
+# node type -> 실행 함수. run_func가 매번 찾아 쓰는 table.
+DISPATCH_TABLE = {}
+PRIMITIVE_TABLE = {}
+SPECIAL_FORM_TABLE = {}
+
+
+def _new_node_type(name):
+    if name in KEYWORD_TYPES:
+        return KEYWORD_TYPES[name]
+    node_type = max(NODETYPE_NAMES) + 1
+    KEYWORD_TYPES[name] = node_type
+    CuteType.KEYWORD_LIST += (name,)
+    CUTETYPE_NAMES[node_type] = name
+    NODETYPE_NAMES[node_type] = name
+    return node_type
+
+
+def _apply_primitive(func):
+    def apply_func(node, env):
+        args = []
+        arg_node = node.value.next
+        while arg_node is not None:
+            args.append(strip_quote(run_expr(arg_node, env)))
+            arg_node = arg_node.next
+        return func(*args)
+    return apply_func
+
+
+def register_primitive(name, func):
+    """
+    인자를 모두 평가한 뒤 호출되는 primitive를 등록함.
+    keyword가 아닌 name은 새 node type을 받아 scanner가 keyword로 인식하게 됨.
+    :type name: str
+    :param func: 평가된 인자 노드들을 받아 결과 노드를 반환하는 함수
+    :return: name에 할당된 node type
+    """
+    node_type = _new_node_type(name)
+    PRIMITIVE_TABLE[node_type] = func
+    SPECIAL_FORM_TABLE.pop(node_type, None)
+    DISPATCH_TABLE[node_type] = _apply_primitive(func)
+    return node_type
+
+
+def register_special_form(name, func):
+    """
+    인자를 평가하지 않고 list 노드 전체를 받는 special form을 등록함.
+    :type name: str
+    :param func: list 노드와 현재 Frame을 받아 결과 노드를 반환하는 함수
+    :return: name에 할당된 node type
+    """
+    node_type = _new_node_type(name)
+    SPECIAL_FORM_TABLE[node_type] = func
+    PRIMITIVE_TABLE.pop(node_type, None)
+    DISPATCH_TABLE[node_type] = func
+    return node_type
+
+
+register_primitive('cons', cons)
+register_primitive('car', car)
+register_primitive('cdr', cdr)
+register_primitive('eq?', eq_q)
+register_primitive('null?', null_q)
+register_primitive('atom?', atom_q)
+register_primitive('not', not_op)
+register_primitive('+', plus)
+register_primitive('-', minus)
+register_primitive('*', multiple)
+register_primitive('/', divide)
+register_primitive('<', lt)
+register_primitive('>', gt)
+register_primitive('=', eq)
+register_special_form('quote', quote)
+register_special_form('cond', cond)
+register_special_form('define', define)
+register_special_form('lambda', lamda)
+
+
+def run_expr(root_node, env=None):
     """
+    cond의 선택된 가지와 lambda body의 마지막 form은 재귀하지 않고
+    root_node, env를 바꿔서 loop를 다시 돔. (tail call)
     :type root_node : Node
+    :type env: Frame
     """
-    if root_node is None:
+    if env is None:
+        env = GLOBAL_FRAME
+    while True:
+        if root_node is None:
+            return None
+
+        if root_node.type is TokenType.ID:
+            if root_node.addr is not None:
+                return lookup_env(env, root_node.addr)
+            result = root_node.lookupTable(env.global_env)
+            if result is not None:
+                return result
+            return root_node
+        elif root_node.type is TokenType.INT:
+            return root_node
+        elif root_node.type is TokenType.TRUE:
+            return root_node
+        elif root_node.type is TokenType.FALSE:
+            return root_node
+        elif root_node.type is TokenType.LIST:
+            op_code_node = root_node.value
+            if op_code_node.type is TokenType.LIST or op_code_node.type is TokenType.ID:
+                if op_code_node.type is TokenType.ID and op_code_node.addr is None:
+                    func_node = lookup_callee(op_code_node, env.global_env)
+                else:
+                    func_node = run_expr(op_code_node, env)
+                args = []
+                arg_node = op_code_node.next
+                while arg_node is not None:
+                    args.append(run_expr(arg_node, env))
+                    arg_node = arg_node.next
+                if PROFILER is not None:
+                    return _profiled_call(func_node, args, op_code_node, env)
+                if func_node.__class__ is MemoClosure:
+                    return call_memo(func_node, args, run_closure)
+                jit = env.global_env.jit
+                if jit is not None:
+                    # compile된 함수가 도는 동안 호출한 쪽 Frame(이전 인자들)을 붙잡지 않게 함
+                    env = None
+                    result = jit.call(func_node, args)
+                    if result is not _INTERPRET:
+                        if result.__class__ is not TailCall:
+                            return result
+                        # compile되지 않은 함수로 이어지는 tail call과 guard가 실패한 호출은
+                        # 여기서 이어서 실행함
+                        func_node, args = result.func_node, result.args
+                        if func_node.__class__ is MemoClosure:
+                            return call_memo(func_node, args, run_closure)
+                env = make_frame(func_node, args)
+                root_node = lambda_body(func_node)
+                while root_node.next is not None:
+                    run_expr(root_node, env)
+                    root_node = root_node.next
+                continue
+            if op_code_node.type is TokenType.COND and op_code_node.next is not None:
+                root_node = select_cond(op_code_node.next, env)
+                continue
+            if PROFILER is not None:
+                return _profiled_list(root_node, env)
+            return run_list(root_node, env)
+        else:
+            print 'Run Expr Error'
         return None
 
-    result = root_node.lookupTemp()
-    if result is not None:
-        return result
 
-    result = root_node.lookupTable()
-    if result is not None:
-        return result
+def run_closure(func_node, args):
+    """
+    closure를 평가된 인자들로 호출하고 body의 마지막 값을 반환함.
+    :type func_node: Closure
+    :type args: list
+    """
+    frame = make_frame(func_node, args)
+    result = None
+    body_node = lambda_body(func_node)
+    while body_node is not None:
+        result = run_expr(body_node, frame)
+        body_node = body_node.next
+    return result
 
-    #if root_node.value in KeywordTable.table.keys(): lookuptable로 만듦.
-    #    return KeywordTable.table[root_node.value]
-    if root_node.type is TokenType.ID:
-        return root_node
-    elif root_node.type is TokenType.INT:
-        return root_node
-    elif root_node.type is TokenType.TRUE:
-        return root_node
-    elif root_node.type is TokenType.FALSE:
-        return root_node
-    elif root_node.type is TokenType.LIST:
-        if root_node.value.type is TokenType.LIST:
-            return run_expr(root_node.value)
-        if root_node.value.value in KeywordTable.temptable.keys():
-            temp = KeywordTable.temptable.get(root_node.value.value)
-            root_node.value.value = temp.value
-            root_node.value.type = temp.type
-            return run_expr(root_node)
-        if root_node.value.value in KeywordTable.table.keys():
-            temp = KeywordTable.table.get(root_node.value.value)
-            root_node.value.value = temp.value
-            root_node.value.type = temp.type
-            return run_expr(root_node)
-        return run_list(root_node)
-    else:
-        print 'Run Expr Error'
-    return None
 
+# closure 엔진: Node를 한번만 훑어서 python closure로 바꾼 뒤 실행함.
+# 각 closure는 현재 Frame을 받아 run_expr와 같은 결과 노드를 반환함.
 
-def print_node(node):
+def compile_expr(node):
     """
-    "Evaluation 후 결과를 출력하기 위한 함수"
-    "입력은 List Node 또는 atom"
     :type node: Node
+    :return: Frame을 받아 node의 평가 결과를 돌려주는 함수
     """
-    def print_list(node):
-        """
-        "List노드의 value에 대해서 출력"
-        "( 2 3 )이 입력이면 2와 3에 대해서 모두 출력함"
-        :type node: Node
-        """
-        def print_list_val(node):
-            if node.next is not None:
-                return print_node(node)+' '+print_list_val(node.next)
-            return print_node(node)
+    if node is None:
+        return _compile_const(None)
+    if node.type is TokenType.ID:
+        return _compile_id(node)
+    if node.type in (TokenType.INT, TokenType.TRUE, TokenType.FALSE):
+        return _compile_const(node)
+    if node.type is TokenType.LIST and node.value is not None:
+        return _compile_list(node)
+
+    def run_error(env):
+        print 'Run Expr Error'
+    return run_error
 
-        if node.type is TokenType.LIST:
-            if node.value is None:
-                return '( )'
-            if node.value.type is TokenType.QUOTE:
-                return print_node(node.value)
-            return '('+print_list_val(node.value)+')'
 
-    if node is None:
-        return ''
-    if node.type in [TokenType.ID, TokenType.INT]:
-        return node.value
-    if node.type is TokenType.TRUE:
-        return '#T'
-    if node.type is TokenType.FALSE:
-        return '#F'
-    if node.type is TokenType.PLUS:
-        return '+'
-    if node.type is TokenType.MINUS:
-        return '-'
-    if node.type is TokenType.TIMES:
-        return '*'
-    if node.type is TokenType.DIV:
-        return '/'
-    if node.type is TokenType.GT:
-        return '>'
-    if node.type is TokenType.LT:
-        return '<'
-    if node.type is TokenType.EQ:
-        return '='
-    if node.type is TokenType.LIST:
-        return print_list(node)
-    if node.type is TokenType.ATOM_Q:
-        return 'atom?'
-    if node.type is TokenType.CAR:
-        return 'car'
-    if node.type is TokenType.CDR:
-        return 'cdr'
-    if node.type is TokenType.COND:
-        return 'cond'
-    if node.type is TokenType.CONS:
-        return 'cons'
-    if node.type is TokenType.LAMBDA:
-        return 'lambda'
-    if node.type is TokenType.NULL_Q:
-        return 'null?'
-    if node.type is TokenType.EQ_Q:
-        return 'eq?'
-    if node.type is TokenType.NOT:
-        return 'not'
-    if node.type is TokenType.QUOTE:
-        return "'"+print_node(node.next)
-    if node.type is TokenType.DEFINE:
-        return 'define'
+def _compile_const(node):
+    return lambda env: node
 
 
-def Test_method(input):
-    test_cute = CuteScanner(input)
-    test_tokens = test_cute.tokenize()
-    test_basic_paser = BasicPaser(test_tokens)
-    node = test_basic_paser.parse_expr()
-    cute_inter = run_expr(node)
-    KeywordTable.temptable.clear()
-    print print_node(cute_inter)
+def _compile_id(node):
+    if node.addr is None:
+        name = node.value
+
+        def load_global(env):
+            binding = env.global_env.table.get(name)
+            if binding is not None:
+                return binding.value
+            return node
+        return load_global
+
+    depth, slot = addr = node.addr
+    if depth == 0:
+        return lambda env: env.values[slot]
+    if depth == 1:
+        return lambda env: env.parent.values[slot]
+    return lambda env: lookup_env(env, addr)
+
+
+def _compile_args(arg_node):
+    arg_codes = []
+    while arg_node is not None:
+        arg_codes.append(compile_expr(arg_node))
+        arg_node = arg_node.next
+    return arg_codes
+
+
+def _compile_list(node):
+    op_code_node = node.value
+    op_type = op_code_node.type
+
+    if op_type is TokenType.ID and op_code_node.addr is None:
+        return _compile_call(lambda env: lookup_callee(op_code_node, env.global_env),
+                             _compile_args(op_code_node.next))
+    if op_type is TokenType.LIST or op_type is TokenType.ID:
+        return _compile_call(compile_expr(op_code_node), _compile_args(op_code_node.next))
+    if op_type in PRIMITIVE_TABLE:
+        return _compile_primitive(PRIMITIVE_TABLE[op_type],
+                                  _compile_args(op_code_node.next))
+    if op_type is TokenType.QUOTE:
+        return _compile_const(quoted_value(node))
+    if op_type is TokenType.COND:
+        return _compile_cond(op_code_node.next)
+    if op_type is TokenType.DEFINE:
+        return _compile_define(op_code_node.next)
+    if op_type is TokenType.LAMBDA:
+        resolve_lambda(op_code_node)
+        return lambda env: Closure(node, env)
+    if op_type in SPECIAL_FORM_TABLE:
+        special_form = SPECIAL_FORM_TABLE[op_type]
+        return lambda env: special_form(node, env)
+
+    def unknown_op(env):
+        return run_func(op_code_node)(node, env)
+    return unknown_op
+
+
+def _compile_primitive(func, arg_codes):
+    if len(arg_codes) == 1:
+        arg_code = arg_codes[0]
+        return lambda env: func(strip_quote(arg_code(env)))
+    if len(arg_codes) == 2:
+        l_code, r_code = arg_codes
+        return lambda env: func(strip_quote(l_code(env)), strip_quote(r_code(env)))
+    return lambda env: func(*[strip_quote(arg_code(env)) for arg_code in arg_codes])
+
+
+def _compile_call(func_code, arg_codes):
+    def call(env):
+        return apply_compiled(func_code(env), [arg_code(env) for arg_code in arg_codes])
+    return call
+
+
+def apply_compiled(func_node, args):
+    """
+    closure를 평가된 인자들로 호출함. body는 처음 호출될 때 compile됨.
+    :type func_node: Closure
+    :type args: list
+    """
+    if func_node.__class__ is MemoClosure:
+        return call_memo(func_node, args, _call_compiled)
+    frame = make_frame(func_node, args)
+    return _lambda_code(func_node.value)(frame)
+
+
+def _call_compiled(func_node, args):
+    frame = make_frame(func_node, args)
+    return _lambda_code(func_node.value)(frame)
 
 
-def Test_All():
+def _lambda_code(lambda_node):
     """
-    Test_method("(+ 1 2 )")
-    Test_method("(- ( + 1 2 ) 4 )")
-    Test_method("(* 3 2 )")
-    Test_method("(/ 10 2 )")
-    Test_method("(< 1 5 )")
-    Test_method("(= 3 ( + 1 2 ) )")
-    Test_method("(> 1 5 )")
-    Test_method("(not #F )")
-    Test_method("(null? '( 1 2 3) )")
-    Test_method("(cond (#F 1) ( #T 2 ) )")
-    Test_method("(cond ( ( null? ' ( 1 2 3 ) ) 1 ) ( ( > 100 10 ) 2 ) ( #T 3 ) )")
+    lambda keyword 노드에 compile 결과를 저장해두고 다음 호출부터 재사용함.
+    :type lambda_node: Node
     """
+    if lambda_node.compiled is None:
+        lambda_node.compiled = _compile_body(lambda_node.next.next)
+    return lambda_node.compiled
 
 
-    print "1번"
-    Test_method("(define a 1)")
-    print "2번"
-    Test_method("(define b '(1 2 3))")
-    print "3번"
-    Test_method("(define c (- 5 2))")
-    print "4번"
-    Test_method("(define d '(+ 2 3)")
-    print "5번"
-    Test_method("(define test b)")
-    Test_method("test")
-    print "6번"
-    Test_method("(+ a 3)")
-    print "7번"
-    Test_method("(define a 2)")
-    Test_method("(* a 4)")
-    print "8번"
-    Test_method("((lambda (x) (* x -2)) 3)")
-    print "9번"
-    Test_method("((lambda (x) (/ x 2)) a)")
-    print "10번"
-    Test_method("((lambda (x y) (* x y)) 3 5)")
-    print "11번"
-    Test_method("((lambda (x y) (* x y)) a 5)")
-    print "12번"
-    Test_method("(define plus1 (lambda (x) (+ x 1)))")
-    Test_method("(plus1 3)")
+def _compile_body(body_node):
+    body_codes = _compile_args(body_node)
+    if len(body_codes) == 1:
+        return body_codes[0]
+
+    def run_body(env):
+        result = None
+        for body_code in body_codes:
+            result = body_code(env)
+        return result
+    return run_body
+
+
+def _compile_define(l_node):
+    r_code = compile_expr(l_node.next)
+    if l_node.addr is not None:
+        addr = l_node.addr
+
+        def define_local(env):
+            value = r_code(env)
+            store_env(env, addr, value)
+            return value
+        return define_local
+
+    name = l_node.value
+    return lambda env: insert_table(name, r_code(env), env.global_env)
+
+
+def _compile_cond(clause_node):
+    if clause_node is None:
+        def cond_error(env):
+            print('cond null error!')
+        return cond_error
+
+    clauses = []
+    while clause_node is not None:
+        test_node = clause_node.value
+        if test_node.type is TokenType.LIST:
+            test_code = compile_expr(test_node)
+        else:
+            test_code = _compile_const(test_node)
+        clauses.append((test_code, compile_expr(test_node.next)))
+        clause_node = clause_node.next
+
+    def run_compiled_cond(env):
+        for test_code, body_code in clauses:
+            cond_node = test_code(env)
+            if cond_node.type is TokenType.TRUE:
+                return body_code(env)
+            if cond_node.type is not TokenType.FALSE:
+                print "Type Error!"
+                return
+    return run_compiled_cond
+
+
+def run_compiled(root_node, env=None):
+    """
+    compile_expr로 바꾼 뒤 실행함. run_expr 대신 쓸 수 있는 엔진.
+    :type root_node: Node
+    :type env: Frame
+    """
+    return compile_expr(root_node)(env if env is not None else GLOBAL_FRAME)
+
+
+# bytecode 엔진: Node를 명령어 list로 compile하고 stack VM에서 실행함.
+# Cute 함수 호출은 VM의 frame stack에 쌓이므로 python 재귀를 쓰지 않음.
+
+class OpCode:
+    CONST = 1               # constants[arg]를 push
+    LOAD_GLOBAL = 2         # constants[arg] ID 노드의 global 값을 push
+    DEFINE = 3              # stack 맨 위 값을 names[arg]로 define
+    STORE_LOCAL = 4         # stack 맨 위 값을 arg = (depth, slot)에 저장
+    CALL = 5                # arg개 인자와 함수를 pop해서 호출
+    TAIL_CALL = 6           # 현재 frame을 재사용하는 CALL
+    RETURN = 7
+    JUMP = 8                # pc = arg
+    JUMP_IF_FALSE = 9       # arg = (#F일 때 갈 곳, #T/#F가 아닐 때 갈 곳)
+    PRIMITIVE = 10          # arg = (node type, 인자 수)
+    EVAL = 11               # constants[arg]를 run_expr로 실행
+    LOAD_LOCAL = 12         # arg = (depth, slot)의 값을 push
+    MAKE_CLOSURE = 13       # constants[arg] lambda로 현재 Frame의 Closure를 만듦
+    POP = 14
+    LOAD_CALLEE = 15        # constants[arg] ID 노드의 global 함수를 inline cache로 찾아 push
+
+    PLUS = 20
+    MINUS = 21
+    TIMES = 22
+    DIV = 23
+    LT = 24
+    GT = 25
+    EQ = 26
+    CAR = 27
+    CDR = 28
+    CONS = 29
+
+
+BYTECODE_VERSION = 5
+
+# 전용 명령어가 있는 primitive들. (node type, 인자 수) -> opcode
+_PRIMITIVE_OPCODES = {
+    (TokenType.PLUS, 2): OpCode.PLUS,
+    (TokenType.MINUS, 2): OpCode.MINUS,
+    (TokenType.TIMES, 2): OpCode.TIMES,
+    (TokenType.DIV, 2): OpCode.DIV,
+    (TokenType.LT, 2): OpCode.LT,
+    (TokenType.GT, 2): OpCode.GT,
+    (TokenType.EQ, 2): OpCode.EQ,
+    (TokenType.CAR, 1): OpCode.CAR,
+    (TokenType.CDR, 1): OpCode.CDR,
+    (TokenType.CONS, 2): OpCode.CONS,
+}
+
+_BINARY_OPCODES = {
+    OpCode.PLUS: plus,
+    OpCode.MINUS: minus,
+    OpCode.TIMES: multiple,
+    OpCode.DIV: divide,
+    OpCode.LT: lt,
+    OpCode.GT: gt,
+    OpCode.EQ: eq,
+    OpCode.CONS: cons,
+}
+
+
+class Bytecode(object):
+
+    def __init__(self):
+        self.instructions = []
+        self.constants = []
+        self.names = []
+
+    def emit(self, op, arg=None):
+        self.instructions.append((op, arg))
+        return len(self.instructions) - 1
+
+    def patch(self, index, arg):
+        self.instructions[index] = (self.instructions[index][0], arg)
+
+    def add_const(self, node):
+        self.constants.append(node)
+        return len(self.constants) - 1
+
+    def add_name(self, name):
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def encode(self):
+        return (tuple(self.instructions),
+                tuple(_encode_node(node) for node in self.constants),
+                tuple(self.names))
+
+    @staticmethod
+    def decode(data):
+        instructions, constants, names = data
+        code = Bytecode()
+        code.instructions = list(instructions)
+        code.constants = [_decode_node(node) for node in constants]
+        code.names = list(names)
+        return code
+
+
+def compile_bytecode(node):
+    """
+    top level form 하나를 Bytecode로 compile함.
+    안에 있는 lambda들도 같이 compile되어 lambda keyword 노드의 code에 들어감.
+    :type node: Node
+    :rtype: Bytecode
+    """
+    code = Bytecode()
+    _emit_expr(code, node, False)
+    code.emit(OpCode.RETURN)
+    return code
+
+
+def _emit_expr(code, node, tail):
+    if node is None:
+        code.emit(OpCode.CONST, code.add_const(None))
+    elif node.type is TokenType.ID:
+        if node.addr is not None:
+            code.emit(OpCode.LOAD_LOCAL, node.addr)
+        else:
+            code.emit(OpCode.LOAD_GLOBAL, code.add_const(node))
+    elif node.type in (TokenType.INT, TokenType.TRUE, TokenType.FALSE):
+        code.emit(OpCode.CONST, code.add_const(node))
+    elif node.type is TokenType.LIST and node.value is not None:
+        _emit_list(code, node, tail)
+    else:
+        code.emit(OpCode.EVAL, code.add_const(node))
+
+
+def _emit_args(code, arg_node):
+    argc = 0
+    while arg_node is not None:
+        _emit_expr(code, arg_node, False)
+        arg_node = arg_node.next
+        argc += 1
+    return argc
+
+
+def _emit_call(code, argc, tail):
+    if tail:
+        code.emit(OpCode.TAIL_CALL, argc)
+    else:
+        code.emit(OpCode.CALL, argc)
+
+
+def _emit_list(code, node, tail):
+    op_code_node = node.value
+    op_type = op_code_node.type
+
+    if op_type is TokenType.LIST or op_type is TokenType.ID:
+        if op_type is TokenType.ID and op_code_node.addr is None:
+            code.emit(OpCode.LOAD_CALLEE, code.add_const(op_code_node))
+        else:
+            _emit_expr(code, op_code_node, False)
+        _emit_call(code, _emit_args(code, op_code_node.next), tail)
+    elif op_type in PRIMITIVE_TABLE:
+        argc = _emit_args(code, op_code_node.next)
+        opcode = _PRIMITIVE_OPCODES.get((op_type, argc))
+        if opcode is not None:
+            code.emit(opcode)
+        else:
+            code.emit(OpCode.PRIMITIVE, (op_type, argc))
+    elif op_type is TokenType.QUOTE:
+        code.emit(OpCode.CONST, code.add_const(quoted_value(node)))
+    elif op_type is TokenType.COND:
+        _emit_cond(code, node, tail)
+    elif op_type is TokenType.DEFINE:
+        _emit_expr(code, op_code_node.next.next, False)
+        if op_code_node.next.addr is not None:
+            code.emit(OpCode.STORE_LOCAL, op_code_node.next.addr)
+        else:
+            code.emit(OpCode.DEFINE, code.add_name(op_code_node.next.value))
+    elif op_type is TokenType.LAMBDA:
+        resolve_lambda(op_code_node)
+        _lambda_bytecode(op_code_node)
+        code.emit(OpCode.MAKE_CLOSURE, code.add_const(node))
+    else:
+        code.emit(OpCode.EVAL, code.add_const(node))
+
+
+def _emit_cond(code, node, tail):
+    clause_node = node.value.next
+    if clause_node is None:
+        code.emit(OpCode.EVAL, code.add_const(node))
+        return
+
+    jumps = []
+    tests = []
+    while clause_node is not None:
+        test_node = clause_node.value
+        if test_node.type is TokenType.LIST:
+            _emit_expr(code, test_node, False)
+        else:
+            code.emit(OpCode.CONST, code.add_const(test_node))
+        tests.append(code.emit(OpCode.JUMP_IF_FALSE))
+        _emit_expr(code, test_node.next, tail)
+        jumps.append(code.emit(OpCode.JUMP))
+        clause_node = clause_node.next
+
+    # 맞는 clause가 없거나 test가 #T/#F가 아니면 None
+    no_clause = code.emit(OpCode.CONST, code.add_const(None))
+    end = len(code.instructions)
+    for test, jump in zip(tests, jumps):
+        code.patch(test, (jump + 1, no_clause))
+        code.patch(jump, end)
+
+
+def _lambda_bytecode(lambda_node):
+    """
+    lambda keyword 노드의 code에 compile 결과를 저장해두고 재사용함.
+    :type lambda_node: Node
+    :rtype: Bytecode
+    """
+    if lambda_node.code is None:
+        code = Bytecode()
+        body_node = lambda_node.next.next
+        while body_node.next is not None:
+            _emit_expr(code, body_node, False)
+            code.emit(OpCode.POP)
+            body_node = body_node.next
+        _emit_expr(code, body_node, True)
+        code.emit(OpCode.RETURN)
+        # 다른 thread가 만들다 만 code를 쓰지 않도록 다 만든 뒤에 붙임
+        lambda_node.code = code
+    return lambda_node.code
+
+
+def run_vm(code, env=None):
+    """
+    Bytecode를 실행하고 결과 노드를 반환함.
+    :type code: Bytecode
+    :type env: Frame
+    """
+    if env is None:
+        env = GLOBAL_FRAME
+    global_env = env.global_env
+    table = global_env.table
+    stack = []
+    frames = []
+    instructions = code.instructions
+    constants = code.constants
+    names = code.names
+    pc = 0
+
+    while True:
+        op, arg = instructions[pc]
+        pc += 1
+
+        if op is OpCode.LOAD_LOCAL:
+            depth, slot = arg
+            if depth == 0:
+                stack.append(env.values[slot])
+            else:
+                stack.append(lookup_env(env, arg))
+        elif op is OpCode.LOAD_GLOBAL:
+            node = constants[arg]
+            binding = table.get(node.value)
+            if binding is None:
+                stack.append(node)
+            else:
+                stack.append(binding.value)
+        elif op is OpCode.LOAD_CALLEE:
+            stack.append(lookup_callee(constants[arg], global_env))
+        elif op is OpCode.CONST:
+            stack.append(constants[arg])
+        elif op in _BINARY_OPCODES:
+            r_node = strip_quote(stack.pop())
+            stack[-1] = _BINARY_OPCODES[op](strip_quote(stack[-1]), r_node)
+        elif op is OpCode.JUMP_IF_FALSE:
+            cond_node = stack.pop()
+            if cond_node.type is TokenType.FALSE:
+                pc = arg[0]
+            elif cond_node.type is not TokenType.TRUE:
+                print "Type Error!"
+                pc = arg[1]
+        elif op is OpCode.JUMP:
+            pc = arg
+        elif op is OpCode.CALL or op is OpCode.TAIL_CALL:
+            args = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            func_node = stack.pop()
+            if func_node.__class__ is MemoClosure:
+                stack.append(call_memo(func_node, args, _call_bytecode))
+                if op is OpCode.TAIL_CALL:
+                    if not frames:
+                        return stack.pop()
+                    instructions, constants, names, pc, env = frames.pop()
+                continue
+            frame = make_frame(func_node, args)
+            if op is OpCode.CALL:
+                frames.append((instructions, constants, names, pc, env))
+            callee = _lambda_bytecode(func_node.value)
+            instructions = callee.instructions
+            constants = callee.constants
+            names = callee.names
+            env = frame
+            pc = 0
+        elif op is OpCode.RETURN:
+            if not frames:
+                return stack.pop()
+            instructions, constants, names, pc, env = frames.pop()
+        elif op is OpCode.POP:
+            stack.pop()
+        elif op is OpCode.CAR:
+            stack[-1] = car(strip_quote(stack[-1]))
+        elif op is OpCode.CDR:
+            stack[-1] = cdr(strip_quote(stack[-1]))
+        elif op is OpCode.MAKE_CLOSURE:
+            stack.append(Closure(constants[arg], env))
+        elif op is OpCode.PRIMITIVE:
+            node_type, argc = arg
+            args = [strip_quote(value) for value in stack[len(stack) - argc:]]
+            del stack[len(stack) - argc:]
+            stack.append(PRIMITIVE_TABLE[node_type](*args))
+        elif op is OpCode.DEFINE:
+            stack[-1] = insert_table(names[arg], stack[-1], global_env)
+        elif op is OpCode.STORE_LOCAL:
+            store_env(env, arg, stack[-1])
+        elif op is OpCode.EVAL:
+            stack.append(run_expr(constants[arg], env))
+
+
+def _call_bytecode(func_node, args):
+    return run_vm(_lambda_bytecode(func_node.value), make_frame(func_node, args))
+
+
+def run_bytecode(root_node, env=None):
+    """
+    compile_bytecode로 바꾼 뒤 run_vm으로 실행함.
+    :type root_node: Node
+    :type env: Frame
+    """
+    return run_vm(compile_bytecode(root_node), env)
+
+
+def _encode_node(node):
+    """
+    node를 marshal할 수 있는 값으로 바꿈. 깊게 중첩된 list도 python 재귀나 marshal의
+    깊이 제한에 걸리지 않도록 노드마다 record 하나를 만들어 평평한 tuple에 두고,
+    자식은 record 번호로 가리킴. 마지막 record가 node임.
+    """
+    if node is None:
+        return None
+    records = []
+    # stack의 각 항목은 [노드, 자식 노드들, 다음에 encode할 자식 번호, 자식 record 번호들]
+    stack = [_encode_entry(node)]
+    while stack:
+        entry = stack[-1]
+        children = entry[1]
+        if entry[2] < len(children):
+            entry[2] += 1
+            stack.append(_encode_entry(children[entry[2] - 1]))
+            continue
+        stack.pop()
+        records.append(_encode_record(entry[0], entry[3]))
+        if stack:
+            stack[-1][3].append(len(records) - 1)
+    return tuple(records)
+
+
+def _encode_entry(node):
+    children = []
+    if node.type is TokenType.PAIR:
+        # 원소들과, 마지막 cdr이 '( )가 아니면 그 cdr까지
+        pair = node
+        while pair.type is TokenType.PAIR and pair is not EMPTY_LIST:
+            children.append(pair.car)
+            pair = pair.cdr
+        if pair is not EMPTY_LIST:
+            children.append(pair)
+    elif node.type is TokenType.LIST:
+        children.extend(_iter_chain(node.value))
+    return [node, children, 0, []]
+
+
+def _encode_record(node, indexes):
+    if node.type is TokenType.PAIR:
+        pair = node
+        count = 0
+        while pair.type is TokenType.PAIR and pair is not EMPTY_LIST:
+            count += 1
+            pair = pair.cdr
+        tail = indexes[count] if count < len(indexes) else None
+        return TokenType.PAIR, tuple(indexes[:count]), tail
+    value = node.value
+    if node.type is TokenType.LIST:
+        value = tuple(indexes)
+    code = None
+    if node.code is not None:
+        code = node.code.encode()
+    return node.type, value, code, node.addr, node.scope
+
+
+def _decode_node(data):
+    """
+    _encode_node의 record들을 앞에서부터 노드로 바꿈. 자식 record는 항상 앞에 있음.
+    """
+    if data is None:
+        return None
+    nodes = []
+    for record in data:
+        if record[0] is TokenType.PAIR:
+            _, items, tail = record
+            pair = EMPTY_LIST
+            if tail is not None:
+                pair = nodes[tail]
+            for index in reversed(items):
+                pair = Pair(nodes[index], pair)
+            nodes.append(pair)
+            continue
+        node_type, value, code, addr, scope = record
+        if node_type is TokenType.LIST:
+            value = _decode_chain([nodes[index] for index in value])
+        node = Node(node_type, value)
+        if code is not None:
+            node.code = Bytecode.decode(code)
+        node.addr = addr
+        node.scope = scope
+        nodes.append(node)
+    return nodes[-1]
+
+
+def _decode_chain(items):
+    for index in xrange(len(items) - 1):
+        items[index].next = items[index + 1]
+    return items[0] if items else None
+
+
+def dump_bytecode(code):
+    """
+    Bytecode를 marshal로 직렬화함. 다시 읽을 때 scan/parse가 필요 없음.
+    :type code: Bytecode
+    :rtype: str
+    """
+    return marshal.dumps((BYTECODE_VERSION, code.encode()))
+
+
+def load_bytecode(data):
+    """
+    dump_bytecode로 만든 문자열을 Bytecode로 되돌림.
+    :type data: str
+    :rtype: Bytecode
+    """
+    version, encoded = marshal.loads(data)
+    if version != BYTECODE_VERSION:
+        raise ValueError('bytecode version %d is not supported' % version)
+    return Bytecode.decode(encoded)
+
+
+# tiered 실행: tree 엔진으로 돌면서 lambda마다 호출 수를 세고,
+# JIT_THRESHOLD번 넘게 불린 lambda는 python source로 바꿔 compile()한 함수로 실행함.
+# cond는 if/elif, 산술은 python 연산자, 자기 자신을 부르는 tail call은 while loop가 됨.
+
+# compile하기 전에 interpreter로 실행하는 호출 수
+JIT_THRESHOLD = 100
+# 산술 primitive node type -> python 연산자
+_JIT_ARITHMETIC = {TokenType.PLUS: '+', TokenType.MINUS: '-', TokenType.TIMES: '*',
+                   TokenType.DIV: '/'}
+_JIT_COMPARISON = {TokenType.LT: '<', TokenType.GT: '>', TokenType.EQ: '=='}
+# 다시 계산해도 같은 값이라 순서를 바꿔 계산해도 되는 식
+_JIT_TRIVIAL_RE = re.compile(r'-?\d+\Z|[akt]\d+(\.value)?\Z|True\Z|False\Z|None\Z')
+# compile 결과가 아직 없다는 표시. tree 엔진이 직접 실행해야 함
+_INTERPRET = object()
+
+
+class TailCall(object):
+    """
+    compile된 함수가 다른 함수를 tail 위치에서 부를 때 python 재귀 대신 돌려주는 값.
+    interpret가 True면 인자 guard가 실패한 호출이라서 compile된 함수로 다시 부르지 않고
+    interpreter가 body를 실행해야 함.
+    """
+    __slots__ = ('func_node', 'args', 'interpret')
+
+    def __init__(self, func_node, args, interpret=False):
+        self.func_node = func_node
+        self.args = args
+        self.interpret = interpret
+
+
+class JitUnsupported(Exception):
+    """
+    lambda에 compile할 수 없는 form이 있음. 그 lambda는 계속 interpreter로 실행함.
+    """
+
+
+class JitCompiler(object):
+    """
+    global 환경 하나의 tiered 실행 상태. KeywordTable.jit에 붙어 있으면 run_expr가 사용함.
+    compile된 함수는 global 값을 호출할 때마다 Binding에서 읽고,
+    참조하는 global 이름이 다시 define되면 버려져서 다시 호출 수를 셈.
+    """
+
+    def __init__(self, global_env, threshold=None):
+        """
+        :type global_env: KeywordTable
+        :param threshold: None이면 JIT_THRESHOLD
+        """
+        self.global_env = global_env
+        self.threshold = threshold if threshold is not None else JIT_THRESHOLD
+        # lambda keyword 노드 -> 호출 수
+        self.counts = {}
+        # lambda keyword 노드 -> compile된 python 함수. compile할 수 없으면 None
+        self.functions = {}
+        # global 이름 -> 그 이름을 참조하는 lambda keyword 노드들
+        self.dependents = {}
+        self.compiled = 0
+        self.deopts = 0
+
+    def lookup(self, func_node):
+        """
+        :return: func_node의 compile된 함수. 아직 없거나 compile할 수 없으면 None
+        """
+        if func_node.__class__ is not Closure:
+            return None
+        lambda_node = func_node.value
+        function = self.functions.get(lambda_node, _MISSING)
+        if function is not _MISSING:
+            return function
+        count = self.counts.get(lambda_node, 0) + 1
+        self.counts[lambda_node] = count
+        if count <= self.threshold:
+            return None
+        writer = _JitWriter(func_node, self)
+        try:
+            function = writer.compile()
+            self.compiled += 1
+        except JitUnsupported:
+            function = None
+        for name in writer.global_names:
+            self.dependents.setdefault(name, set()).add(lambda_node)
+        self.functions[lambda_node] = function
+        return function
+
+    def call(self, func_node, args):
+        """
+        compile된 함수로 호출함. 돌려받은 TailCall도 compile된 함수면 이어서 실행함.
+        compile된 함수로 실행하면 args는 비워짐.
+        :return: 결과 노드, compile되지 않았거나 interpret해야 하는 함수로 이어지는 TailCall,
+                 func_node가 compile되지 않았으면 _INTERPRET
+        """
+        function = self.lookup(func_node)
+        if function is None:
+            return _INTERPRET
+        while True:
+            result = function(args)
+            if result.__class__ is not TailCall or result.interpret:
+                return result
+            function = self.lookup(result.func_node)
+            if function is None:
+                return result
+            args = result.args
+
+    def apply(self, func_node, args):
+        """
+        compile된 함수 안의 tail이 아닌 호출. 결과 노드가 나올 때까지 실행함.
+        """
+        if func_node.__class__ is MemoClosure:
+            return call_memo(func_node, args, run_closure)
+        result = self.call(func_node, args)
+        if result is _INTERPRET:
+            return run_closure(func_node, args)
+        if result.__class__ is TailCall:
+            if result.interpret:
+                return run_closure(result.func_node, result.args)
+            return self.apply(result.func_node, result.args)
+        return result
+
+    def invalidate(self, name):
+        """
+        name을 참조하는 compile된 함수들을 버림.
+        """
+        for lambda_node in self.dependents.pop(name, ()):
+            self.counts.pop(lambda_node, None)
+            if self.functions.pop(lambda_node, None) is not None:
+                self.deopts += 1
+
+
+class _JitWriter(object):
+    """
+    closure 하나의 lambda를 python 함수 source로 바꿈.
+    인자는 a0, a1 .., 상수는 k0 .., Binding은 b0 .., primitive 함수는 p0 .., 임시 변수는 t0 ..
+    """
+
+    def __init__(self, func_node, jit):
+        """
+        :type func_node: Closure
+        :type jit: JitCompiler
+        """
+        self.func_node = func_node
+        self.jit = jit
+        self.params, self.local_names = func_node.value.scope
+        self.lines = []
+        self.namespace = {
+            'Node': Node, 'Pair': Pair, 'TailCall': TailCall, 'INT': TokenType.INT,
+            'TRUE': TokenType.TRUE, 'FALSE': TokenType.FALSE,
+            'TRUE_NODE': TRUE_NODE, 'FALSE_NODE': FALSE_NODE,
+            'EMPTY_LIST': EMPTY_LIST, '_sq': strip_quote, '_apply': jit.apply,
+            '_env': jit.global_env, '_C': func_node,
+            '_slow': lambda func: lambda *args: jit.apply(func, list(args)),
+            '_done': lambda result: jit.apply(result.func_node, result.args)
+            if result.__class__ is TailCall else result,
+            '_fallback': lambda args: run_closure(func_node, args),
+            '_deopt': lambda args: TailCall(func_node, args, True),
+        }
+        self.names = {}
+        self.global_names = set()
+        self.int_params = set()
+        self.temp_count = 0
+        # tail 위치에 호출이 있으면 자기 자신을 직접 부른 결과도 TailCall일 수 있음
+        self.tail_calls = _has_tail_call(lambda_body(func_node))
+
+    def compile(self):
+        """
+        같은 body로 인자들을 받는 함수와 인자 list 하나를 받는 entry 함수를 만듦.
+        entry는 받은 list를 비워서, tail call로 도는 동안 처음 인자(stream의 앞부분 등)를
+        붙잡고 있지 않음.
+        :return: entry 함수. 인자 수가 다르면 make_frame처럼 None으로 채우거나 버림
+        """
+        if self.local_names:
+            raise JitUnsupported('define in lambda body')
+        body_node = lambda_body(self.func_node)
+        while body_node.next is not None:
+            self.emit(2, self.node(body_node, 2))
+            body_node = body_node.next
+        self.tail(body_node, 2)
+
+        params = ['a%d' % index for index in range(len(self.params))]
+        head = ['def compiled(%s):' % ', '.join(['%s=None' % name for name in params] + ['*extra'])]
+        entry = ['def entry(args):']
+        if params:
+            entry.append('    %s, = (args + [None] * %d)[:%d]' % (
+                ', '.join(params), len(params), len(params)))
+        entry.append('    del args[:]')
+        # guard가 실패하면 compiled는 interpreter로 실행한 값을, entry는 run_expr의 loop가
+        # 이어서 실행하도록 TailCall을 돌려줌. entry에서 run_closure를 부르면 body의 tail call이
+        # 다시 entry로 들어와서 반복할 때마다 python stack이 쌓임
+        source = '\n'.join(head + self.loop(params, '_fallback') + [''] +
+                           entry + self.loop(params, '_deopt')) + '\n'
+        exec compile(source, '<jit>', 'exec', 0, True) in self.namespace
+        function = self.namespace['entry']
+        function.source = source
+        self.namespace['_fn'] = self.namespace['compiled']
+        return function
+
+    def loop(self, params, fallback):
+        lines = ['    while True:']
+        for index in sorted(self.int_params):
+            lines.append('        if a%d is None or a%d.type is not INT:' % (index, index))
+            lines.append('            return %s([%s])' % (fallback, ', '.join(params)))
+        lines.append('        if _env.budget is not None:')
+        lines.append('            _env.budget.charge()')
+        return lines + self.lines
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def temp(self):
+        self.temp_count += 1
+        return 't%d' % (self.temp_count - 1)
+
+    def constant(self, value, prefix='k'):
+        key = (prefix, id(value))
+        name = self.names.get(key)
+        if name is None:
+            name = self.names[key] = '%s%d' % (prefix, len(self.names))
+            self.namespace[name] = value
+        return name
+
+    def binding(self, name):
+        """
+        :return: global 이름의 Binding을 가리키는 변수. 아직 define되지 않았으면 JitUnsupported
+        """
+        self.global_names.add(name)
+        binding = self.jit.global_env.table.get(name)
+        if binding is None:
+            raise JitUnsupported('unbound global %s' % name)
+        return self.constant(binding, 'b')
+
+    def is_self(self, head_node):
+        return head_node.type is TokenType.ID and head_node.addr is None and \
+            self.jit.global_env.table.get(head_node.value) is not None and \
+            self.jit.global_env.table[head_node.value].value is self.func_node
+
+    def sequence(self, compilers, indent):
+        """
+        식들을 차례대로 compile함. 뒤의 식이 문장을 만들면 앞의 식들을 먼저 임시 변수에 계산해서
+        실행 순서가 interpreter와 같게 함.
+        :param compilers: 식 문자열을 돌려주는 함수들
+        """
+        exprs = []
+        for compile_expr in compilers:
+            mark = len(self.lines)
+            expr = compile_expr()
+            if len(self.lines) > mark:
+                emitted = self.lines[mark:]
+                del self.lines[mark:]
+                for index, previous in enumerate(exprs):
+                    if not _JIT_TRIVIAL_RE.match(previous):
+                        exprs[index] = self.temp()
+                        self.emit(indent, '%s = %s' % (exprs[index], previous))
+                self.lines.extend(emitted)
+            exprs.append(expr)
+        return exprs
+
+    def args(self, head_node, indent):
+        compilers = []
+        arg_node = head_node.next
+        while arg_node is not None:
+            compilers.append(lambda arg_node=arg_node: self.node(arg_node, indent))
+            arg_node = arg_node.next
+        return compilers
+
+    def variable(self, node):
+        """
+        :return: 인자 변수 이름. 바깥 lambda의 변수면 JitUnsupported
+        """
+        depth, slot = node.addr
+        if depth:
+            raise JitUnsupported('free variable %s' % node.value)
+        return 'a%d' % slot
+
+    def node(self, node, indent):
+        """
+        :return: run_expr와 같은 결과 노드를 만드는 식
+        """
+        if node.type is TokenType.ID:
+            if node.addr is not None:
+                return self.variable(node)
+            return '(%s.value or %s)' % (self.binding(node.value), self.constant(node))
+        if node.type in (TokenType.INT, TokenType.TRUE, TokenType.FALSE):
+            return self.constant(node)
+        if node.type is not TokenType.LIST or node.value is None:
+            raise JitUnsupported(print_node(node))
+
+        op_code_node = node.value
+        op_type = op_code_node.type
+        if op_type is TokenType.ID or op_type is TokenType.LIST:
+            head_node = op_code_node
+            if self.is_self(head_node):
+                exprs = self.sequence([lambda: '%s.value' % self.binding(head_node.value)] +
+                                      self.args(head_node, indent), indent)
+                call = '(_fn if %s is _C else _slow(%s))(%s)' % (
+                    exprs[0], exprs[0], ', '.join(exprs[1:]))
+                return '_done(%s)' % call if self.tail_calls else call
+            exprs = self.sequence([lambda: self.head(head_node, indent)] +
+                                  self.args(head_node, indent), indent)
+            return '_apply(%s, [%s])' % (exprs[0], ', '.join(exprs[1:]))
+        if op_type is TokenType.QUOTE:
+            return self.constant(quoted_value(node))
+        if op_type is TokenType.COND:
+            if op_code_node.next is None:
+                raise JitUnsupported('empty cond')
+            result = self.temp()
+            self.cond(op_code_node.next, indent,
+                      lambda body, body_indent: self.emit(body_indent, '%s = %s' % (
+                          result, self.node(body, body_indent) if body is not None else 'None')))
+            return result
+        if op_type in _JIT_ARITHMETIC and _arg_count(op_code_node) == 2:
+            if self.is_int(node):
+                return 'Node(INT, %s)' % self.number(node, indent)
+            return self.binary(op_code_node, indent, 'Node(INT, %%s.value %s %%s.value)'
+                               % _JIT_ARITHMETIC[op_type])
+        if op_type in _JIT_COMPARISON and _arg_count(op_code_node) == 2 and \
+                not (self.is_int(op_code_node.next) and self.is_int(op_code_node.next.next)):
+            return self.binary(op_code_node, indent, '(TRUE_NODE if %%s.value %s %%s.value '
+                               'else FALSE_NODE)' % _JIT_COMPARISON[op_type])
+        if op_type in (TokenType.LT, TokenType.GT, TokenType.EQ, TokenType.NOT,
+                       TokenType.NULL_Q):
+            return '(TRUE_NODE if %s else FALSE_NODE)' % self.test(node, indent)
+        if op_type in PRIMITIVE_TABLE:
+            exprs = self.sequence(self.args(op_code_node, indent), indent)
+            args = ['_sq(%s)' % expr for expr in exprs]
+            if op_type is TokenType.CAR and len(args) == 1:
+                return '%s.car' % args[0]
+            if op_type is TokenType.CDR and len(args) == 1:
+                return '%s.cdr' % args[0]
+            if op_type is TokenType.CONS and len(args) == 2:
+                return 'Pair(%s, %s)' % tuple(args)
+            return '%s(%s)' % (self.constant(PRIMITIVE_TABLE[op_type], 'p'), ', '.join(args))
+        raise JitUnsupported(print_node(op_code_node))
+
+    def head(self, head_node, indent):
+        if head_node.type is TokenType.ID and head_node.addr is None:
+            return '%s.value' % self.binding(head_node.value)
+        return self.node(head_node, indent)
+
+    def is_int(self, node):
+        """
+        숫자, 이 lambda의 인자, 그것들의 산술이면 python int로 계산함.
+        인자는 함수 시작에서 INT인지 확인하고 아니면 interpreter로 실행함.
+        """
+        if node.type is TokenType.INT:
+            return True
+        if node.type is TokenType.ID:
+            return node.addr is not None and not node.addr[0]
+        return node.type is TokenType.LIST and node.value is not None and \
+            node.value.type in _JIT_ARITHMETIC and _arg_count(node.value) == 2 and \
+            self.is_int(node.value.next) and self.is_int(node.value.next.next)
+
+    def number(self, node, indent):
+        """
+        :return: is_int인 노드의 python int 식
+        """
+        if node.type is TokenType.INT:
+            return repr(node.value)
+        if node.type is TokenType.ID:
+            param = self.variable(node)
+            self.int_params.add(int(param[1:]))
+            return '%s.value' % param
+        l_node = node.value.next
+        exprs = self.sequence([lambda: self.number(l_node, indent),
+                               lambda: self.number(l_node.next, indent)], indent)
+        return '(%s %s %s)' % (exprs[0], _JIT_ARITHMETIC[node.value.type], exprs[1])
+
+    def binary(self, op_code_node, indent, native):
+        """
+        INT인지 모르는 값의 산술, 비교. 둘 다 INT면 native 식으로, 아니면 primitive 함수로 계산함.
+        :param native: 두 임시 변수 이름을 받는 python 식 format
+        """
+        l_node = op_code_node.next
+        exprs = self.sequence([lambda: self.node(l_node, indent),
+                               lambda: self.node(l_node.next, indent)], indent)
+        for index, expr in enumerate(exprs):
+            if not _JIT_TRIVIAL_RE.match(expr):
+                exprs[index] = self.temp()
+                self.emit(indent, '%s = %s' % (exprs[index], expr))
+        return '(%s if %s.type is INT and %s.type is INT else %s(_sq(%s), _sq(%s)))' % (
+            native % tuple(exprs), exprs[0], exprs[1],
+            self.constant(PRIMITIVE_TABLE[op_code_node.type], 'p'), exprs[0], exprs[1])
+
+    def test(self, node, indent):
+        """
+        :return: 결과가 #T인지의 python bool 식. #T, #F가 아닐 수도 있는 식이면 None
+        """
+        if node.type is TokenType.TRUE:
+            return 'True'
+        if node.type is TokenType.FALSE:
+            return 'False'
+        if node.type is not TokenType.LIST or node.value is None:
+            return None
+        op_code_node = node.value
+        op_type = op_code_node.type
+        if op_type in _JIT_COMPARISON and _arg_count(op_code_node) == 2:
+            l_node = op_code_node.next
+            if not (self.is_int(l_node) and self.is_int(l_node.next)):
+                return None
+            exprs = self.sequence([lambda: self.number(l_node, indent),
+                                   lambda: self.number(l_node.next, indent)], indent)
+            return '(%s %s %s)' % (exprs[0], _JIT_COMPARISON[op_type], exprs[1])
+        if op_type is TokenType.NOT and _arg_count(op_code_node) == 1:
+            result = self.test(op_code_node.next, indent)
+            if result is not None:
+                return '(not %s)' % result
+            return '(_sq(%s).type is FALSE)' % self.node(op_code_node.next, indent)
+        if op_type is TokenType.NULL_Q and _arg_count(op_code_node) == 1:
+            return '(%s is EMPTY_LIST)' % self.node(op_code_node.next, indent)
+        if op_type in (TokenType.LT, TokenType.GT, TokenType.EQ, TokenType.NOT,
+                       TokenType.NULL_Q):
+            raise JitUnsupported('wrong argument count')
+        if op_type in (TokenType.ATOM_Q, TokenType.EQ_Q):
+            return '(%s is TRUE_NODE)' % self.node(node, indent)
+        return None
+
+    def cond(self, clause_node, indent, finish):
+        """
+        select_cond처럼 clause를 고르는 if/elif 문장들을 만듦.
+        :param finish: (선택된 노드, indent)를 받아 그 가지의 문장을 만드는 함수
+        """
+        keyword = 'if'
+        while clause_node is not None:
+            test_node = clause_node.value
+            if test_node.type is not TokenType.LIST:
+                # 평가하지 않는 test. #F는 건너뛰고 #T가 아니면 Type Error
+                if test_node.type is TokenType.FALSE:
+                    clause_node = clause_node.next
+                    continue
+                if keyword != 'if':
+                    self.emit(indent, 'else:')
+                    indent += 1
+                if test_node.type is TokenType.TRUE:
+                    finish(test_node.next, indent)
+                else:
+                    self.emit(indent, "print 'Type Error!'")
+                    finish(None, indent)
+                return
+
+            # elif로 이어 쓸 수 없으면 else 안에 넣으므로 test의 문장은 한 단계 안쪽에 만듦
+            mark = len(self.lines)
+            test_indent = indent if keyword == 'if' else indent + 1
+            result = self.test(test_node, test_indent)
+            if result is None:
+                value = self.node(test_node, test_indent)
+            if keyword != 'if' and (result is None or len(self.lines) > mark):
+                emitted = self.lines[mark:]
+                del self.lines[mark:]
+                self.emit(indent, 'else:')
+                self.lines.extend(emitted)
+                indent += 1
+                keyword = 'if'
+            if result is None:
+                test = self.temp()
+                self.emit(indent, '%s = %s' % (test, value))
+                self.emit(indent, '%s %s.type is TRUE:' % (keyword, test))
+                finish(test_node.next, indent + 1)
+                self.emit(indent, 'elif %s.type is not FALSE:' % test)
+                self.emit(indent + 1, "print 'Type Error!'")
+                finish(None, indent + 1)
+            else:
+                self.emit(indent, '%s %s:' % (keyword, result))
+                finish(test_node.next, indent + 1)
+            keyword = 'elif'
+            clause_node = clause_node.next
+
+        if keyword == 'if':
+            finish(None, indent)
+        else:
+            self.emit(indent, 'else:')
+            finish(None, indent + 1)
+
+    def tail(self, node, indent):
+        """
+        lambda body의 마지막 노드를 돌려주는 문장들. 자기 자신을 부르면 인자를 바꾸고 loop를 다시 돔.
+        """
+        if node is None:
+            self.emit(indent, 'return None')
+            return
+        if node.type is TokenType.LIST and node.value is not None:
+            op_code_node = node.value
+            if op_code_node.type is TokenType.COND and op_code_node.next is not None:
+                self.cond(op_code_node.next, indent, self.tail)
+                return
+            if op_code_node.type is TokenType.ID or op_code_node.type is TokenType.LIST:
+                func = self.temp()
+                self.emit(indent, '%s = %s' % (func, self.head(op_code_node, indent)))
+                exprs = self.sequence(self.args(op_code_node, indent), indent)
+                if self.is_self(op_code_node) and len(exprs) == len(self.params):
+                    self.emit(indent, 'if %s is _C:' % func)
+                    if exprs:
+                        self.emit(indent + 1, '%s = %s' % (
+                            ', '.join('a%d' % index for index in range(len(exprs))),
+                            ', '.join(exprs)))
+                    self.emit(indent + 1, 'continue')
+                self.emit(indent, 'return TailCall(%s, [%s])' % (func, ', '.join(exprs)))
+                return
+        self.emit(indent, 'return %s' % self.node(node, indent))
+
+
+def _arg_count(op_code_node):
+    count = 0
+    arg_node = op_code_node.next
+    while arg_node is not None:
+        count += 1
+        arg_node = arg_node.next
+    return count
+
+
+def _has_tail_call(body_node):
+    """
+    lambda body의 tail 위치에 함수 호출이 있는지.
+    """
+    while body_node.next is not None:
+        body_node = body_node.next
+    stack = [body_node]
+    while stack:
+        node = stack.pop()
+        if node is None or node.type is not TokenType.LIST or node.value is None:
+            continue
+        op_code_node = node.value
+        if op_code_node.type is TokenType.COND:
+            clause_node = op_code_node.next
+            while clause_node is not None:
+                stack.append(clause_node.value.next)
+                clause_node = clause_node.next
+        elif op_code_node.type is TokenType.ID or op_code_node.type is TokenType.LIST:
+            return True
+    return False
+
+
+def run_tiered(root_node, env=None):
+    """
+    global 환경에 JitCompiler를 붙이고 tree 엔진으로 실행함.
+    :type root_node: Node
+    :type env: Frame
+    """
+    if env is None:
+        env = GLOBAL_FRAME
+    if env.global_env.jit is None:
+        env.global_env.jit = JitCompiler(env.global_env)
+    return run_expr(root_node, env)
+
+
+# Test_method에서 고를 수 있는 평가 엔진들.
+ENGINES = {
+    'tree': run_expr,
+    'closure': run_compiled,
+    'vm': run_bytecode,
+    'tiered': run_tiered,
+}
+
+
+# 평가 전에 AST를 바꾸는 optimizer. 입력 노드는 바꾸지 않고 새 노드로 만듦.
+
+# 인자가 모두 INT 상수면 미리 계산하는 primitive들
+_FOLD_TYPES = (TokenType.PLUS, TokenType.MINUS, TokenType.TIMES, TokenType.DIV,
+               TokenType.LT, TokenType.GT, TokenType.EQ)
+# 부작용 없이 값만 만드는 primitive들. 인자로 쓰이면 inline해도 됨
+_PURE_TYPES = _FOLD_TYPES + (TokenType.NOT, TokenType.CAR, TokenType.CDR, TokenType.CONS,
+                             TokenType.ATOM_Q, TokenType.NULL_Q, TokenType.EQ_Q)
+_LITERAL_TYPES = (TokenType.INT, TokenType.TRUE, TokenType.FALSE)
+# define 말고 global 이름을 정의하는 special form들. 이 form으로 정의되는 이름은 inline하지 않음
+GLOBAL_BINDER_TYPES = set()
+# inline할 lambda body의 최대 노드 수와, inline 결과를 다시 inline하는 최대 깊이
+_INLINE_SIZE = 12
+_INLINE_DEPTH = 8
+
+
+class Optimizer(object):
+    """
+    상수 계산, 항상 #T/#F인 cond clause 정리, 작은 lambda의 inline을 함.
+    """
+
+    def __init__(self, inline_names=()):
+        """
+        :param inline_names: 프로그램 전체에서 한번만 define되어 inline해도 되는 이름들
+        """
+        self.inline_names = frozenset(inline_names)
+        # 이름 -> (인자 이름 tuple, body 노드, 인자별 사용 횟수, body에 cond가 있는지)
+        self.inlinable = {}
+
+    def optimize(self, node):
+        """
+        top level form 하나를 바꾼 새 노드를 반환함.
+        inline_names에 있는 이름을 작은 lambda로 define하면 다음 form부터 inline됨.
+        :type node: Node
+        """
+        result = self._optimize(node, frozenset(), 0)
+        if _is_form(result, TokenType.DEFINE):
+            name_node = result.value.next
+            value_node = name_node.next
+            if name_node.value in self.inline_names and _is_form(value_node, TokenType.LAMBDA):
+                self._register(name_node.value, value_node.value)
+        return result
+
+    def _optimize(self, node, shadowed, depth):
+        if node.type is not TokenType.LIST or node.value is None:
+            return Node(node.type, node.value)
+        op_code_node = node.value
+        if op_code_node.type is TokenType.QUOTE:
+            # quote된 값은 바꿀 게 없으므로 안쪽 노드를 그대로 씀
+            return Node(TokenType.LIST, op_code_node)
+        if op_code_node.type is TokenType.LAMBDA:
+            return self._optimize_lambda(op_code_node, shadowed, depth)
+        if op_code_node.type is TokenType.COND:
+            return self._optimize_cond(op_code_node, shadowed, depth)
+
+        items = [self._optimize(item, shadowed, depth) for item in _iter_chain(op_code_node)]
+        head = items[0]
+        if head.type in _FOLD_TYPES and len(items) == 3 \
+                and items[1].type is TokenType.INT and items[2].type is TokenType.INT:
+            try:
+                result = PRIMITIVE_TABLE[head.type](items[1], items[2])
+            except ZeroDivisionError:
+                return _make_list(items)
+            return Node(result.type, result.value)
+        if head.type is TokenType.NOT and len(items) == 2 and items[1].type in _LITERAL_TYPES:
+            return Node(not_op(items[1]).type)
+        if head.type is TokenType.ID and head.value in self.inlinable \
+                and head.value not in shadowed and depth < _INLINE_DEPTH:
+            inlined = self._inline(head.value, items[1:])
+            if inlined is not None:
+                return self._optimize(inlined, shadowed, depth + 1)
+        return _make_list(items)
+
+    def _optimize_lambda(self, lambda_node, shadowed, depth):
+        params_node = lambda_node.next
+        local_names = set(item.value for item in _iter_chain(params_node.value))
+        for body_node in _iter_chain(params_node.next):
+            if _is_form(body_node, TokenType.DEFINE):
+                local_names.add(body_node.value.next.value)
+        shadowed = shadowed | local_names
+        items = [Node(TokenType.LAMBDA, lambda_node.value),
+                 self._optimize(params_node, shadowed, depth)]
+        items.extend(self._optimize(body_node, shadowed, depth)
+                     for body_node in _iter_chain(params_node.next))
+        return _make_list(items)
+
+    def _optimize_cond(self, cond_node, shadowed, depth):
+        clauses = [self._optimize_clause(clause, shadowed, depth)
+                   for clause in _iter_chain(cond_node.next)]
+        reachable = []
+        for clause in clauses:
+            test_type = clause.value.type if clause.type is TokenType.LIST \
+                and clause.value is not None else None
+            if test_type is TokenType.FALSE:
+                continue
+            reachable.append(clause)
+            # #T 뒤나, test가 #T/#F가 아니라 Type Error가 나는 clause 뒤는 실행되지 않음
+            if test_type is not TokenType.LIST:
+                break
+        if not reachable:
+            # clause가 모두 #F면 결과가 없는 cond 그대로 둠
+            reachable = clauses
+        first = reachable[0].value
+        if first.type is TokenType.TRUE and first.next is not None:
+            first.next.next = None
+            return first.next
+        return _make_list([Node(TokenType.COND, cond_node.value)] + reachable)
+
+    def _optimize_clause(self, clause, shadowed, depth):
+        # clause는 호출 form이 아니므로 test와 실행할 식들을 하나씩 바꿈
+        if clause.type is not TokenType.LIST or clause.value is None:
+            return Node(clause.type, clause.value)
+        return _make_list([self._optimize(item, shadowed, depth)
+                           for item in _iter_chain(clause.value)])
+
+    def _register(self, name, lambda_node):
+        params_node = lambda_node.next
+        params = tuple(item.value for item in _iter_chain(params_node.value))
+        body = params_node.next
+        if body is None or body.next is not None or len(set(params)) != len(params):
+            return
+        uses = dict((param, 0) for param in params)
+        size = [0]
+        branching = [False]
+
+        def visit(node):
+            size[0] += 1
+            if node.type is TokenType.ID:
+                if node.value not in uses:
+                    return False
+                uses[node.value] += 1
+            elif node.type in (TokenType.DEFINE, TokenType.LAMBDA):
+                return False
+            elif node.type is TokenType.COND:
+                branching[0] = True
+            elif node.type is TokenType.LIST and node.value is not None:
+                if node.value.type is TokenType.QUOTE:
+                    return True
+                if node.value.type is TokenType.COND:
+                    for clause in _iter_chain(node.value.next):
+                        # cond test 자리의 이름은 평가되지 않으므로 인자 식으로 바꾸면 결과가 달라짐
+                        if clause.type is TokenType.LIST and clause.value is not None \
+                                and clause.value.type is TokenType.ID \
+                                and clause.value.value in uses:
+                            return False
+                return all(visit(item) for item in _iter_chain(node.value))
+            return True
+
+        if visit(body) and size[0] <= _INLINE_SIZE:
+            self.inlinable[name] = (params, body, uses, branching[0])
+
+    def _inline(self, name, args):
+        params, body, uses, branching = self.inlinable[name]
+        if len(args) != len(params):
+            return None
+        for param, arg in zip(params, args):
+            # 한번만, 반드시 평가되는 자리에 쓰이는 인자만 식 그대로 넣음
+            if not _is_simple(arg) and (uses[param] != 1 or branching or not _is_pure(arg)):
+                return None
+        return _substitute(body, dict(zip(params, args)))
+
+
+def _iter_chain(node):
+    while node is not None:
+        yield node
+        node = node.next
+
+
+def _make_list(items):
+    for index in xrange(len(items) - 1):
+        items[index].next = items[index + 1]
+    return Node(TokenType.LIST, items[0] if items else None)
+
+
+def _is_form(node, op_type):
+    return node is not None and node.type is TokenType.LIST and node.value is not None \
+        and node.value.type is op_type
+
+
+def _is_simple(node):
+    return node.type in _LITERAL_TYPES or node.type is TokenType.ID \
+        or _is_form(node, TokenType.QUOTE)
+
+
+def _is_pure(node):
+    if _is_simple(node):
+        return True
+    return node.type is TokenType.LIST and node.value is not None \
+        and node.value.type in _PURE_TYPES \
+        and all(_is_pure(item) for item in _iter_chain(node.value.next))
+
+
+def _substitute(node, args):
+    """
+    node를 복사하면서 args에 있는 이름의 ID 노드를 인자 식의 복사본으로 바꿈.
+    """
+    if node.type is TokenType.ID and node.value in args:
+        return _substitute(args[node.value], {})
+    if node.type is not TokenType.LIST or node.value is None or _is_form(node, TokenType.QUOTE):
+        return Node(node.type, node.value)
+    return _make_list([_substitute(item, args) for item in _iter_chain(node.value)])
+
+
+def _global_defines(node, counts):
+    """
+    lambda 밖에서 define되는 이름마다 몇 번 define되는지 셈.
+    GLOBAL_BINDER_TYPES의 form으로 정의되는 이름은 inline되지 않게 두 번으로 셈.
+    """
+    if not _is_form(node, TokenType.LAMBDA) and not _is_form(node, TokenType.QUOTE) \
+            and node.type is TokenType.LIST and node.value is not None:
+        if node.value.next is not None and node.value.next.type is TokenType.ID:
+            name = node.value.next.value
+            if node.value.type is TokenType.DEFINE:
+                counts[name] = counts.get(name, 0) + 1
+            elif node.value.type in GLOBAL_BINDER_TYPES:
+                counts[name] = counts.get(name, 0) + 2
+        for item in _iter_chain(node.value):
+            _global_defines(item, counts)
+
+
+def optimize_program(nodes):
+    """
+    top level form들을 optimizer로 바꿔서 하나씩 yield함.
+    다시 define되는 이름은 inline하지 않도록 form을 모두 먼저 훑음.
+    :type nodes: list
+    """
+    counts = {}
+    for node in nodes:
+        _global_defines(node, counts)
+    optimizer = Optimizer(name for name, count in counts.items() if count == 1)
+    for node in nodes:
+        yield optimizer.optimize(node)
+
+
+# define-memo로 만든 pure 함수의 결과를 인자 값으로 저장해두는 memoization.
+
+# 함수 하나가 저장하는 결과의 기본 최대 개수
+MEMO_CACHE_SIZE = 1024
+_MISSING = object()
+
+
+class MemoCache(object):
+    """
+    함수 하나의 결과 cache. 가득 차면 가장 오래 쓰지 않은 결과부터 버림.
+    """
+
+    def __init__(self, name, lambda_node, global_env, size=None):
+        """
+        :type name: str
+        :param lambda_node: memoize할 lambda keyword 노드
+        :param global_env: 함수가 define된 global 환경
+        :param size: 최대 결과 수. None이면 MEMO_CACHE_SIZE
+        """
+        self.name = name
+        self.lambda_node = lambda_node
+        self.global_env = global_env
+        self.size = size if size is not None else MEMO_CACHE_SIZE
+        self.results = OrderedDict()
+        self.pure = None
+        self.dependencies = ()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def is_pure(self):
+        """
+        처음 부를 때와 의존하는 이름이 다시 define된 뒤에만 body를 검사함.
+        """
+        if self.pure is None:
+            dependencies = set()
+            self.pure = _is_pure_lambda(self.lambda_node, self.name, self.global_env,
+                                        dependencies, set())
+            self.dependencies = tuple(dependencies)
+            for name in self.dependencies:
+                self.global_env.memo_dependents.setdefault(name, set()).add(self)
+        return self.pure
+
+    def lookup(self, key):
+        result = self.results.pop(key, _MISSING)
+        if result is _MISSING:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.results[key] = result
+        return result
+
+    def store(self, key, result):
+        self.results[key] = result
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self):
+        self.results.clear()
+        self.pure = None
+        for name in self.dependencies:
+            self.global_env.memo_dependents[name].discard(self)
+        self.dependencies = ()
+        self.invalidations += 1
+
+
+class MemoClosure(Closure):
+    """
+    define-memo로 만든 closure. 호출은 call_memo를 거침.
+    """
+    __slots__ = ('memo',)
+
+    def __init__(self, closure, name):
+        """
+        :type closure: Closure
+        :type name: str
+        """
+        Node.__init__(self, TokenType.LIST, closure.value)
+        self.env = closure.env
+        self.memo = MemoCache(name, closure.value, closure.env.global_env)
+
+
+def _is_pure_lambda(lambda_node, name, global_env, dependencies, visiting):
+    """
+    lambda body에 define이 없고 pure primitive와 pure 함수만 부르는지 검사함.
+    body가 참조하는 global 이름은 dependencies에 모음.
+    :param name: memoize하는 함수 이름. 자기 자신을 부르는 것은 pure로 봄
+    :param visiting: 검사 중인 lambda 노드들. 서로 부르는 함수는 pure로 봄
+    """
+    if lambda_node in visiting:
+        return True
+    visiting.add(lambda_node)
+    resolve_lambda(lambda_node)
+    stack = list(_iter_chain(lambda_node.next.next))
+    while stack:
+        node = stack.pop()
+        if node.type is TokenType.ID:
+            if node.addr is None:
+                dependencies.add(node.value)
+            continue
+        if node.type is not TokenType.LIST or node.value is None:
+            continue
+        op_code_node = node.value
+        if op_code_node.type is TokenType.QUOTE:
+            continue
+        if op_code_node.type is TokenType.COND:
+            for clause in _iter_chain(op_code_node.next):
+                if clause.type is not TokenType.LIST:
+                    return False
+                stack.extend(_iter_chain(clause.value))
+            continue
+        if op_code_node.type is TokenType.ID and op_code_node.addr is None:
+            dependencies.add(op_code_node.value)
+            if op_code_node.value != name:
+                func_node = op_code_node.lookupTable(global_env)
+                if not isinstance(func_node, Closure) or not _is_pure_lambda(
+                        func_node.value, name, global_env, dependencies, visiting):
+                    return False
+        elif op_code_node.type not in _PURE_TYPES:
+            return False
+        stack.extend(_iter_chain(op_code_node.next))
+    return True
+
+
+# 값이 아니라 객체 자체로 구별하는 node type들
+_IDENTITY_TYPES = (TokenType.PAIR, TokenType.VECTOR, TokenType.PROMISE, TokenType.TABLE)
+
+
+def _memo_key(node):
+    # 숫자, 이름, #T/#F는 값으로, 그 밖의 값과 closure는 객체 자체로 구별함
+    if node.type in _IDENTITY_TYPES or isinstance(node, Closure):
+        return node
+    return node.type, node.value
+
+
+def call_memo(func_node, args, apply_func):
+    """
+    cache에 있으면 저장된 결과를, 없으면 apply_func(func_node, args)의 결과를 저장해서 반환함.
+    body가 pure가 아니면 저장하지 않고 그대로 호출함.
+    :type func_node: MemoClosure
+    :param apply_func: 엔진마다 closure를 실제로 실행하는 함수
+    """
+    memo = func_node.memo
+    if not memo.is_pure():
+        return apply_func(func_node, args)
+    key = tuple(_memo_key(arg) for arg in args)
+    result = memo.lookup(key)
+    if result is _MISSING:
+        result = apply_func(func_node, args)
+        memo.store(key, result)
+    return result
+
+
+def invalidate_memo(name, global_env):
+    """
+    name이 다시 define되면 name을 참조하는 memo cache들을 비움.
+    :type global_env: KeywordTable
+    """
+    for memo in list(global_env.memo_dependents.get(name, ())):
+        memo.invalidate()
+
+
+def define_memo(node, env):
+    """
+    (define-memo name expr). define처럼 global로 정의하고 값이 closure면 memoize함.
+    """
+    l_node = node.value.next
+    value = run_expr(l_node.next, env)
+    if isinstance(value, Closure):
+        value = MemoClosure(value, l_node.value)
+        env.global_env.memo_caches[l_node.value] = value.memo
+    return insert_table(l_node.value, value, env.global_env)
+
+
+def memo_stats(global_env=None):
+    """
+    :param global_env: None이면 GLOBAL_FRAME의 global 환경
+    :return: 이름 -> (hits, misses, evictions, invalidations, 저장된 결과 수)
+    """
+    if global_env is None:
+        global_env = GLOBAL_FRAME.global_env
+    return dict((name, (memo.hits, memo.misses, memo.evictions, memo.invalidations,
+                        len(memo.results)))
+                for name, memo in global_env.memo_caches.items())
+
+
+GLOBAL_BINDER_TYPES.add(register_special_form('define-memo', define_memo))
+
+
+# numpy 배열로 계산하는 숫자 vector. 산술, 비교 primitive는 vector끼리는 원소별로,
+# vector와 숫자는 숫자를 모든 원소에 broadcast해서 계산함.
+
+# 이름 -> (numpy 함수 이름, numpy가 없을 때 쓰는 python 연산, 결과가 비교 결과인지)
+_VECTOR_OPS = {
+    'add': ('add', operator.add, False),
+    'sub': ('subtract', operator.sub, False),
+    'mul': ('multiply', operator.mul, False),
+    'div': ('floor_divide', operator.floordiv, False),
+    'lt': ('less', operator.lt, True),
+    'gt': ('greater', operator.gt, True),
+    'eq': ('equal', operator.eq, True),
+}
+
+
+def make_vector_items(values, boolean=False):
+    """
+    :param values: python int 또는 bool들
+    :return: Vector.items로 쓸 배열
+    """
+    if numpy is not None:
+        return numpy.array(values, dtype=numpy.bool_ if boolean else numpy.int_)
+    return array('b' if boolean else 'l', values)
+
+
+def _vector_operand(node):
+    if node.type is TokenType.VECTOR:
+        return node.items
+    if node.type is not TokenType.INT:
+        raise TypeError('vector operand must be a number or a vector: %s' % print_node(node))
+    return node.value
+
+
+def vector_binary(name, l_node, r_node):
+    """
+    산술, 비교 primitive의 vector 연산. 둘 다 vector가 아니면 원래의 AttributeError를 다시 냄.
+    :param name: _VECTOR_OPS의 이름
+    """
+    if l_node.type is not TokenType.VECTOR and r_node.type is not TokenType.VECTOR:
+        # primitive의 except 안에서 불리므로 처리 중인 AttributeError가 다시 나감
+        raise
+    numpy_name, func, boolean = _VECTOR_OPS[name]
+    left = _vector_operand(l_node)
+    right = _vector_operand(r_node)
+    if name == 'div':
+        # numpy는 0으로 나누면 경고만 내므로 숫자 나눗셈처럼 ZeroDivisionError를 냄
+        if r_node.type is TokenType.INT:
+            zero = right == 0
+        elif numpy is not None:
+            zero = bool(numpy.any(right == 0))
+        else:
+            zero = 0 in right
+        if zero:
+            raise ZeroDivisionError('integer division or modulo by zero')
+    if numpy is not None:
+        return Vector(getattr(numpy, numpy_name)(left, right), boolean)
+
+    if l_node.type is not TokenType.VECTOR:
+        values = [func(left, item) for item in right]
+    elif r_node.type is not TokenType.VECTOR:
+        values = [func(item, right) for item in left]
+    else:
+        if len(left) != len(right):
+            raise ValueError('vector lengths differ: %d, %d' % (len(left), len(right)))
+        values = list(imap(func, left, right))
+    return Vector(make_vector_items(values, boolean), boolean)
+
+
+def vector_text(vector):
+    """
+    :type vector: Vector
+    :return: #(1 2 3) 꼴의 출력 문자열
+    """
+    values = vector.items.tolist()
+    if not values:
+        return '#( )'
+    if vector.boolean:
+        return '#(' + ' '.join('#T' if value else '#F' for value in values) + ')'
+    return '#(' + ' '.join(imap(str, values)) + ')'
+
+
+def make_vector(size_node, fill_node=None):
+    fill = fill_node.value if fill_node is not None else 0
+    if numpy is not None:
+        return Vector(numpy.full(size_node.value, fill, dtype=numpy.int_))
+    return Vector(array('l', [fill]) * size_node.value)
+
+
+def list_to_vector(l_node):
+    values = []
+    while l_node is not EMPTY_LIST:
+        element = l_node.car
+        if element.type is not TokenType.INT:
+            raise TypeError('list->vector needs a list of numbers: %s' % print_node(element))
+        values.append(element.value)
+        l_node = l_node.cdr
+    return Vector(make_vector_items(values))
+
+
+def vector_ref(v_node, index_node):
+    index = index_node.value
+    if not 0 <= index < len(v_node.items):
+        raise IndexError('vector-ref index %d out of range' % index)
+    if v_node.boolean:
+        return bool_node(bool(v_node.items[index]))
+    return Node(TokenType.INT, int(v_node.items[index]))
+
+
+def vector_set(v_node, index_node, value_node):
+    """
+    (vector-set! v i x). v의 i번째 원소를 바꾸고 v를 반환함.
+    """
+    index = index_node.value
+    if not 0 <= index < len(v_node.items):
+        raise IndexError('vector-set! index %d out of range' % index)
+    if v_node.boolean:
+        if value_node.type is not TokenType.TRUE and value_node.type is not TokenType.FALSE:
+            raise TypeError('vector-set! needs #T or #F: %s' % print_node(value_node))
+        v_node.items[index] = value_node.type is TokenType.TRUE
+    else:
+        if value_node.type is not TokenType.INT:
+            raise TypeError('vector-set! needs a number: %s' % print_node(value_node))
+        v_node.items[index] = value_node.value
+    return v_node
+
+
+def vector_length(v_node):
+    return Node(TokenType.INT, len(v_node.items))
+
+
+def vector_sum(v_node):
+    if numpy is not None:
+        return Node(TokenType.INT, int(v_node.items.sum()))
+    return Node(TokenType.INT, sum(v_node.items))
+
+
+def vector_max(v_node):
+    if numpy is not None:
+        return Node(TokenType.INT, int(v_node.items.max()))
+    return Node(TokenType.INT, max(v_node.items))
+
+
+register_primitive('make-vector', make_vector)
+register_primitive('list->vector', list_to_vector)
+register_primitive('vector-ref', vector_ref)
+register_primitive('vector-set!', vector_set)
+register_primitive('vector-length', vector_length)
+register_primitive('vector-sum', vector_sum)
+register_primitive('vector-max', vector_max)
+
+
+# delay, force와 stream. stream은 원소와 나머지 stream의 promise로 된 Pair이고
+# 빈 stream은 '( )임. 필요한 원소만 만들고 지나간 원소는 참조가 없으면 버려지므로
+# 끝이 없는 stream도 일정한 메모리로 처리할 수 있음.
+
+def delay(node, env):
+    """
+    (delay expr). expr를 평가하지 않고 현재 Frame과 함께 promise로 만듦.
+    """
+    expr_node = node.value.next
+    return Promise(lambda: run_expr(expr_node, env))
+
+
+def force(node):
+    """
+    promise면 값을 한번만 계산해서 저장해둔 값을, promise가 아니면 그대로 반환함.
+    """
+    if node.type is not TokenType.PROMISE:
+        return node
+    thunk = node.thunk
+    if thunk is not None:
+        value = strip_quote(thunk())
+        # thunk 안에서 같은 promise를 force했으면 먼저 저장된 값을 씀
+        if node.thunk is not None:
+            node.value = value
+            node.thunk = None
+    return node.value
+
+
+def apply_closure(func_node, args):
+    """
+    primitive 안에서 closure를 평가된 인자들로 호출함.
+    :type func_node: Closure
+    """
+    if func_node.__class__ is MemoClosure:
+        return strip_quote(call_memo(func_node, args, run_closure))
+    return strip_quote(run_closure(func_node, args))
+
+
+def stream_cons(node, env):
+    """
+    (stream-cons a b). a는 바로 평가하고 b는 delay함.
+    """
+    l_node = node.value.next
+    r_node = l_node.next
+    return Pair(strip_quote(run_expr(l_node, env)), Promise(lambda: run_expr(r_node, env)))
+
+
+def stream_car(s_node):
+    return s_node.car
+
+
+def stream_cdr(s_node):
+    # 빈 stream의 나머지는 빈 stream임
+    if s_node is EMPTY_LIST:
+        return EMPTY_LIST
+    return force(s_node.cdr)
+
+
+def stream_map(func_node, s_node):
+    """
+    (stream-map f s). 원소마다 f를 부른 결과의 stream. 원소는 필요할 때 계산함.
+    """
+    if s_node is EMPTY_LIST:
+        return EMPTY_LIST
+    return Pair(apply_closure(func_node, [s_node.car]),
+                Promise(lambda: stream_map(func_node, force(s_node.cdr))))
+
+
+def stream_filter(func_node, s_node):
+    """
+    (stream-filter f s). f의 결과가 #F가 아닌 원소들의 stream.
+    """
+    # 조건에 맞지 않는 원소들은 재귀 없이 건너뜀
+    while s_node is not EMPTY_LIST:
+        if apply_closure(func_node, [s_node.car]).type is not TokenType.FALSE:
+            return Pair(s_node.car, Promise(lambda: stream_filter(func_node, force(s_node.cdr))))
+        s_node = force(s_node.cdr)
+    return EMPTY_LIST
+
+
+def stream_take(s_node, count_node):
+    """
+    s_node의 처음 count_node개 원소로 된 stream. 원소는 필요할 때 만들어짐.
+    """
+    count = count_node.value
+    if count <= 0 or s_node is EMPTY_LIST:
+        return EMPTY_LIST
+    rest_count = Node(TokenType.INT, count - 1)
+    return Pair(s_node.car, Promise(lambda: stream_take(force(s_node.cdr), rest_count)))
+
+
+register_special_form('delay', delay)
+register_primitive('force', force)
+register_special_form('stream-cons', stream_cons)
+register_primitive('stream-car', stream_car)
+register_primitive('stream-cdr', stream_cdr)
+register_primitive('stream-map', stream_map)
+register_primitive('stream-filter', stream_filter)
+register_primitive('stream-take', stream_take)
+
+
+# 숫자와 이름을 key로 쓰는 hash table. alist를 car, cdr로 찾는 대신 한번에 찾음.
+
+def _table_key(node):
+    if node.type is TokenType.INT or node.type is TokenType.ID:
+        return node.value
+    raise TypeError('table key must be a number or a symbol: %s' % print_node(node))
+
+
+def table_text(table):
+    """
+    #table((key . 값) ..). key 순서로 출력함. 빈 table은 #table( )임.
+    """
+    if not table.items:
+        return '#table( )'
+    entries = ['(%s . %s)' % (_atom_text(key_node), ''.join(_iter_value(value_node)))
+               for _, (key_node, value_node) in sorted(table.items.items())]
+    return '#table(' + ' '.join(entries) + ')'
+
+
+def make_table():
+    return Table()
+
+
+def table_ref(t_node, key_node, default_node=FALSE_NODE):
+    """
+    (table-ref t key [default]). key가 없으면 default, default가 없으면 #F를 반환함.
+    """
+    entry = t_node.items.get(_table_key(key_node))
+    if entry is None:
+        return default_node
+    return entry[1]
+
+
+def table_set(t_node, key_node, value_node):
+    """
+    (table-set! t key x). t를 반환함.
+    """
+    t_node.items[_table_key(key_node)] = (key_node, value_node)
+    return t_node
+
+
+def table_count(t_node):
+    return Node(TokenType.INT, len(t_node.items))
+
+
+register_primitive('make-table', make_table)
+register_primitive('table-ref', table_ref)
+register_primitive('table-set!', table_set)
+register_primitive('table-count', table_count)
+
+
+# tree 엔진(run_expr)의 profiler. Profiler.start()를 부른 동안만 호출마다 기록하고,
+# 꺼져 있을 때는 run_expr가 PROFILER is None 확인만 함.
+PROFILER = None
+
+
+class Profiler(object):
+    """
+    함수 이름, primitive 별 호출 수, inclusive/exclusive 시간, 만든 노드 수, 최대 호출 깊이.
+    함수 이름은 호출한 위치의 이름이고 ((lambda ...) ...)처럼 이름이 없으면 'lambda'.
+    재귀 호출의 inclusive 값은 가장 바깥 호출에서만 더함.
+    global 상태를 쓰므로 한번에 하나만, 한 thread에서만 켬.
+    """
+
+    def __init__(self):
+        # 이름 -> [calls, inclusive, exclusive, inclusive nodes, exclusive nodes, max depth]
+        self.stats = {}
+        # 호출 중인 것들. [이름, path 번호, 시작 시간, 자식 시간, 시작 노드 수, 자식 노드 수]
+        self.stack = []
+        # 이름별로 호출 중인 수. 0에서 시작한 호출만 inclusive에 더함
+        self.active = {}
+        # (부모 path 번호, 이름) -> path 번호. 0은 빈 stack
+        self.paths = {}
+        self.path_keys = [None]
+        # path 번호 -> exclusive 시간. collapsed stack 출력에 씀
+        self.collapsed = {}
+        # 켜져 있는 동안 만든 Node, Pair 수
+        self.allocated = 0
+        self.saved_inits = None
+
+    def start(self):
+        global PROFILER
+        if PROFILER is not None:
+            raise RuntimeError('profiler is already running')
+        profiler = self
+        self.saved_inits = (Node.__init__, Pair.__init__)
+        node_init, pair_init = self.saved_inits
+
+        def counting_node_init(node, *args, **kwargs):
+            profiler.allocated += 1
+            node_init(node, *args, **kwargs)
+
+        def counting_pair_init(pair, car, cdr):
+            profiler.allocated += 1
+            pair_init(pair, car, cdr)
+
+        Node.__init__ = counting_node_init
+        Pair.__init__ = counting_pair_init
+        PROFILER = self
+        return self
+
+    def stop(self):
+        global PROFILER
+        if PROFILER is self:
+            Node.__init__, Pair.__init__ = self.saved_inits
+            PROFILER = None
+        # 예외로 빠져나간 호출들을 정리함
+        while self.stack:
+            self.exit()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def enter(self, name):
+        stack = self.stack
+        key = (stack[-1][1] if stack else 0, name)
+        path = self.paths.get(key)
+        if path is None:
+            path = self.paths[key] = len(self.path_keys)
+            self.path_keys.append(key)
+        stack.append([name, path, time.time(), 0.0, self.allocated, 0])
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = [0, 0.0, 0.0, 0, 0, 0]
+        stats[0] += 1
+        if len(stack) > stats[5]:
+            stats[5] = len(stack)
+        self.active[name] = self.active.get(name, 0) + 1
+
+    def exit(self):
+        name, path, start, child_time, start_allocated, child_allocated = self.stack.pop()
+        elapsed = time.time() - start
+        allocated = self.allocated - start_allocated
+        stats = self.stats[name]
+        self.active[name] -= 1
+        if not self.active[name]:
+            stats[1] += elapsed
+            stats[3] += allocated
+        stats[2] += elapsed - child_time
+        stats[4] += allocated - child_allocated
+        self.collapsed[path] = self.collapsed.get(path, 0.0) + elapsed - child_time
+        if self.stack:
+            parent = self.stack[-1]
+            parent[3] += elapsed
+            parent[5] += allocated
+
+    def report(self, limit=None, sort='exclusive'):
+        """
+        :param limit: 출력할 최대 줄 수. None이면 전부
+        :param sort: 'calls', 'inclusive', 'exclusive', 'nodes', 'depth' 중 정렬 기준
+        :return: exclusive 시간이 큰 순서의 표 문자열
+        """
+        column = {'calls': 0, 'inclusive': 1, 'exclusive': 2, 'nodes': 4, 'depth': 5}[sort]
+        rows = sorted(self.stats.items(), key=lambda item: (-item[1][column], item[0]))
+        lines = ['%-20s %10s %10s %10s %10s %10s %6s' % (
+            'name', 'calls', 'incl ms', 'excl ms', 'incl nodes', 'excl nodes', 'depth')]
+        for name, (calls, inclusive, exclusive, nodes, own_nodes, depth) in rows[:limit]:
+            lines.append('%-20s %10d %10.3f %10.3f %10d %10d %6d' % (
+                name, calls, inclusive * 1000, exclusive * 1000, nodes, own_nodes, depth))
+        return '\n'.join(lines)
+
+    def collapsed_stacks(self):
+        """
+        flamegraph.pl 등이 읽는 'a;b;c 값' 줄들. 값은 exclusive 시간(us)
+        :return: 줄 문자열의 list
+        """
+        lines = []
+        for path, elapsed in sorted(self.collapsed.items()):
+            names = []
+            while path:
+                path, name = self.path_keys[path]
+                names.append(name)
+            names.reverse()
+            lines.append('%s %d' % (';'.join(names), int(elapsed * 1000000)))
+        return lines
+
+
+def _profile_name(head_node):
+    """
+    :type head_node: Node
+    :param head_node: 호출 list의 첫 노드
+    """
+    if head_node.type is TokenType.ID:
+        return head_node.value
+    return 'lambda'
+
+
+def _profiled_call(func_node, args, head_node, env):
+    """
+    profiler가 켜져 있을 때 run_expr 대신 closure를 호출함.
+    body 마지막의 호출은 python 재귀 없이 이 loop에서 이어서 하므로 tail call loop도 깊어지지 않음.
+    :type func_node: Closure
+    :type args: list
+    :type head_node: Node
+    :type env: Frame
+    """
+    profiler = PROFILER
+    while True:
+        profiler.enter(_profile_name(head_node))
+        try:
+            if func_node.__class__ is MemoClosure:
+                return call_memo(func_node, args, run_closure)
+            env = make_frame(func_node, args)
+            body_node = lambda_body(func_node)
+            while body_node.next is not None:
+                run_expr(body_node, env)
+                body_node = body_node.next
+            while _is_form(body_node, TokenType.COND) and body_node.value.next is not None:
+                body_node = select_cond(body_node.value.next, env)
+            if body_node is None or body_node.type is not TokenType.LIST or \
+                    body_node.value.type not in (TokenType.LIST, TokenType.ID):
+                return run_expr(body_node, env)
+            head_node = body_node.value
+            if head_node.type is TokenType.ID and head_node.addr is None:
+                func_node = lookup_callee(head_node, env.global_env)
+            else:
+                func_node = run_expr(head_node, env)
+            args = []
+            arg_node = head_node.next
+            while arg_node is not None:
+                args.append(run_expr(arg_node, env))
+                arg_node = arg_node.next
+        finally:
+            profiler.exit()
+
+
+def _profiled_list(root_node, env):
+    """
+    profiler가 켜져 있을 때 primitive, special form 하나를 기록하면서 평가함.
+    :type root_node: Node
+    :type env: Frame
+    """
+    profiler = PROFILER
+    if root_node.value.type is TokenType.QUOTE:
+        profiler.enter('quote')
+    else:
+        profiler.enter(print_node(root_node.value))
+    try:
+        return run_list(root_node, env)
+    finally:
+        profiler.exit()
+
+
+def profile_expr(root_node, env=None, profiler=None):
+    """
+    root_node를 tree 엔진으로 평가하는 동안 profiler를 켬.
+    :type root_node: Node
+    :param profiler: 결과를 더할 Profiler. None이면 새로 만듦
+    :return: (결과 노드, Profiler)
+    """
+    if profiler is None:
+        profiler = Profiler()
+    with profiler:
+        return run_expr(root_node, env), profiler
+
+
+# atom 노드 type -> 출력 문자열. ID, INT와 등록된 keyword는 노드의 value를 씀
+_PRINT_NAMES = {
+    TokenType.TRUE: '#T', TokenType.FALSE: '#F', TokenType.PLUS: '+', TokenType.MINUS: '-',
+    TokenType.TIMES: '*', TokenType.DIV: '/', TokenType.GT: '>', TokenType.LT: '<',
+    TokenType.EQ: '=', TokenType.ATOM_Q: 'atom?', TokenType.CAR: 'car', TokenType.CDR: 'cdr',
+    TokenType.COND: 'cond', TokenType.CONS: 'cons', TokenType.LAMBDA: 'lambda',
+    TokenType.NULL_Q: 'null?', TokenType.EQ_Q: 'eq?', TokenType.NOT: 'not',
+    TokenType.DEFINE: 'define',
+}
+# write_node가 모아서 한번에 쓰는 출력 조각 수
+WRITE_CHUNK_SIZE = 8192
+
+
+def print_node(node):
+    """
+    "Evaluation 후 결과를 출력하기 위한 함수"
+    "입력은 List Node 또는 atom"
+    :type node: Node
+    """
+    if node is None:
+        return ''
+    if node.type is TokenType.PAIR or node.type is TokenType.LIST or \
+            node.type is TokenType.QUOTE:
+        return ''.join(iter_node(node))
+    return _atom_text(node)
+
+
+def iter_node(node):
+    """
+    print_node의 결과를 조각 문자열로 나눠 yield함. 긴 list도 python 재귀 없이 출력함.
+    :type node: Node
+    """
+    if node is None:
+        return
+    if node.type is TokenType.PAIR:
+        yield "'"
+    for piece in _iter_value(node):
+        yield piece
+
+
+def write_node(node, out, chunk_size=None):
+    """
+    print_node의 결과를 out.write로 씀. 조각들을 chunk_size개씩 모아서 씀.
+    :type node: Node
+    :param out: write 메소드가 있는 file 같은 객체
+    :param chunk_size: None이면 WRITE_CHUNK_SIZE
+    """
+    pieces = iter_node(node)
+    while True:
+        parts = list(islice(pieces, chunk_size or WRITE_CHUNK_SIZE))
+        if not parts:
+            return
+        out.write(''.join(parts))
+
+
+def _atom_text(node):
+    if node.type is TokenType.ID:
+        return node.value
+    if node.type is TokenType.INT:
+        return str(node.value)
+    name = _PRINT_NAMES.get(node.type)
+    if name is not None:
+        return name
+    if node.type is TokenType.VECTOR:
+        return vector_text(node)
+    if node.type is TokenType.PROMISE:
+        return '#<promise>'
+    if node.type is TokenType.TABLE:
+        return table_text(node)
+    if node.type in DISPATCH_TABLE:
+        return node.value
+    return None
+
+
+def _iter_value(node):
+    """
+    값 하나의 출력 조각들. Pair는 앞의 quote 없이 출력함.
+    stack의 각 항목은 [Pair chain인지, 다음에 출력할 Pair 또는 노드, 첫 원소인지]
+    """
+    stack = []
+    value = node
+    while True:
+        # value 하나를 출력하거나, list면 '('를 출력하고 stack에 올림
+        while value is not None:
+            if value.type is TokenType.PAIR:
+                if value is EMPTY_LIST:
+                    yield '( )'
+                else:
+                    yield '('
+                    stack.append([True, value, True])
+                break
+            if value.type is TokenType.LIST:
+                if value.value is None:
+                    yield '( )'
+                    break
+                if value.value.type is TokenType.QUOTE:
+                    value = value.value
+                    continue
+                yield '('
+                stack.append([False, value.value, True])
+                break
+            if value.type is TokenType.QUOTE:
+                yield "'"
+                value = value.next
+                continue
+            yield _atom_text(value)
+            break
+
+        if not stack:
+            return
+        entry = stack[-1]
+        current = entry[1]
+        if entry[0]:
+            # 숫자, 이름 원소는 앞의 공백과 합쳐서 바로 출력함
+            while current.type is TokenType.PAIR and current is not EMPTY_LIST:
+                element = current.car
+                if element.type is TokenType.INT:
+                    text = str(element.value)
+                elif element.type is TokenType.ID:
+                    text = element.value
+                else:
+                    break
+                current = current.cdr
+                if entry[2]:
+                    entry[2] = False
+                    yield text
+                else:
+                    yield ' ' + text
+            entry[1] = current
+            if current is EMPTY_LIST:
+                stack.pop()
+                yield ')'
+                value = None
+                continue
+            if current.type is not TokenType.PAIR:
+                # . 뒤의 마지막 cdr
+                entry[1] = EMPTY_LIST
+                yield ' . '
+                value = current
+                continue
+            entry[1] = current.cdr
+            value = current.car
+        else:
+            if current is None:
+                stack.pop()
+                yield ')'
+                value = None
+                continue
+            entry[1] = current.next
+            value = current
+        if entry[2]:
+            entry[2] = False
+        else:
+            yield ' '
+
+
+# 파일 전체를 읽지 않고 chunk 단위로 읽으면서 top level form을 하나씩 꺼냄.
+_FORM_TOKEN_RE = re.compile(r"[()']|[^\s()']+")
+_LAST_BOUNDARY_RE = re.compile(r"[\s()'][^\s()']*\Z")
+
+
+def read_forms(source_file, chunk_size=65536):
+    """
+    source_file에서 top level form의 source 문자열을 하나씩 yield함.
+    메모리에는 chunk 하나와 아직 끝나지 않은 form 하나만 남음.
+    :param source_file: read(size)가 있는 file 객체
+    :type chunk_size: int
+    """
+    buffer = ''
+    pos = 0
+    start = None
+    depth = 0
+    eof = False
+
+    while not eof:
+        chunk = source_file.read(chunk_size)
+        eof = not chunk
+        buffer += chunk
+
+        # 마지막 atom은 다음 chunk에서 이어질 수 있으므로 경계까지만 봄.
+        if eof:
+            limit = len(buffer)
+        else:
+            boundary = _LAST_BOUNDARY_RE.search(buffer, pos)
+            if boundary is None:
+                continue
+            limit = boundary.start() + 1
+
+        for match in _FORM_TOKEN_RE.finditer(buffer, pos, limit):
+            token = match.group()
+            if start is None:
+                start = match.start()
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+                if depth < 0:
+                    depth = 0
+                    start = None
+                    continue
+            elif token == "'":
+                continue
+            if depth == 0:
+                yield buffer[start:match.end()]
+                start = None
+
+        if start is not None:
+            buffer = buffer[start:]
+            pos = limit - start
+            start = 0
+        else:
+            buffer = buffer[limit:]
+            pos = 0
+
+    if start is not None and buffer[start:].strip():
+        yield buffer[start:]
+
+
+def iter_forms(source_file, chunk_size=65536):
+    """
+    read_forms로 꺼낸 form을 scan, parse해서 Node를 하나씩 yield함.
+    """
+    for form_source in read_forms(source_file, chunk_size):
+        yield BasicPaser(scan_source(form_source)).parse_expr()
+
+
+def run_program(source_file, engine='tree', chunk_size=65536, optimize=False, env=None):
+    """
+    form을 읽는 대로 평가하고 결과 노드를 하나씩 yield함.
+    optimize하면 다시 define되는 이름을 찾기 위해 form을 모두 읽은 뒤 실행함.
+    :param env: top level Frame. None이면 GLOBAL_FRAME
+    """
+    evaluate = ENGINES[engine]
+    forms = iter_forms(source_file, chunk_size)
+    if optimize:
+        forms = optimize_program(list(forms))
+    for node in forms:
+        yield evaluate(node, env)
+
+
+def run_file(path, engine='tree', optimize=False, cache=None):
+    """
+    Cute source 파일을 처음부터 실행하면서 결과를 출력함.
+    :type path: str
+    :type cache: ProgramCache
+    """
+    with open(path) as source_file:
+        if cache is not None and not optimize:
+            results = run_source(source_file.read(), engine, cache)
+        else:
+            results = run_program(source_file, engine, optimize=optimize)
+        for result in results:
+            write_node(result, sys.stdout)
+            sys.stdout.write('\n')
+
+
+class ProgramCache(object):
+    """
+    source 문자열의 parse된 form과 bytecode를 저장함. key는 source의 sha1.
+    메모리에는 최근에 쓴 size개만 두고, directory를 주면 .pyc처럼 파일로도 저장해서
+    다시 시작한 뒤에도 scan, parse, compile 없이 읽음.
+    """
+
+    def __init__(self, size=128, directory=None):
+        """
+        :param size: 메모리에 둘 source 수
+        :param directory: 파일 저장소 경로. None이면 메모리만 씀
+        """
+        self.size = size
+        self.directory = directory
+        self.entries = OrderedDict()
+        # 여러 Interpreter가 thread에서 같이 쓰므로 entries는 lock을 잡고 바꿈
+        self.lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def load(self, source):
+        """
+        :type source: str
+        :return: form마다 CachedForm의 list
+        """
+        key = hashlib.sha1(source).hexdigest()
+        with self.lock:
+            forms = self.entries.pop(key, None)
+            if forms is not None:
+                self.memory_hits += 1
+                self.entries[key] = forms
+                return forms
+        forms = self._read(key)
+        if forms is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            forms = [CachedForm(node, compile_bytecode(node))
+                     for node in iter_forms(StringIO(source))]
+            self._write(key, forms)
+        with self.lock:
+            self.entries[key] = forms
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return forms
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.cutec')
+
+    def _read(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as cache_file:
+                tag, stored_key, encoded = marshal.load(cache_file)
+        except (IOError, EOFError, ValueError, TypeError):
+            return None
+        if tag != _cache_tag() or stored_key != key:
+            return None
+        return [CachedForm(None, None, node, code) for node, code in encoded]
+
+    def _write(self, key, forms):
+        if self.directory is None:
+            return
+        try:
+            encoded = [form.encode() for form in forms]
+        except (ValueError, RuntimeError):
+            # encode할 수 없는 form이 있으면 파일에는 저장하지 않고 실행만 함
+            return
+        try:
+            os.makedirs(self.directory)
+        except OSError as error:
+            # 다른 process나 thread가 먼저 만들었으면 그대로 씀
+            if error.errno != errno.EEXIST:
+                raise
+        # 다른 process, thread가 쓰다 만 파일을 읽지 않도록 각자의 임시 파일에 쓴 뒤 이름을 바꿈
+        temp_path = '%s.%d.%d.tmp' % (self._path(key), os.getpid(), threading.current_thread().ident)
+        with open(temp_path, 'wb') as cache_file:
+            marshal.dump((_cache_tag(), key, encoded), cache_file)
+        os.rename(temp_path, self._path(key))
+
+
+class CachedForm(object):
+    """
+    ProgramCache에 저장된 form 하나. 파일에는 Node와 Bytecode를 따로 marshal한 문자열로 두고
+    엔진이 쓰는 쪽만 처음 쓸 때 decode함.
+    """
+    __slots__ = ('_node', '_code', '_encoded_node', '_encoded_code')
+
+    def __init__(self, node, code, encoded_node=None, encoded_code=None):
+        self._node = node
+        self._code = code
+        self._encoded_node = encoded_node
+        self._encoded_code = encoded_code
+
+    @property
+    def node(self):
+        if self._node is None:
+            self._node = _decode_node(marshal.loads(self._encoded_node))
+        return self._node
+
+    @property
+    def code(self):
+        if self._code is None:
+            self._code = Bytecode.decode(marshal.loads(self._encoded_code))
+        return self._code
+
+    def encode(self):
+        if self._encoded_node is None:
+            encoded_node = marshal.dumps(_encode_node(self._node))
+            self._encoded_code = marshal.dumps(self._code.encode())
+            self._encoded_node = encoded_node
+        return self._encoded_node, self._encoded_code
+
+
+def _cache_tag():
+    """
+    저장된 파일을 만든 인터프리터가 지금과 같은지 확인하는 값.
+    bytecode 형식, python 버전, node type 번호가 바뀌면 달라짐.
+    """
+    return '%d-%d.%d-%s' % (BYTECODE_VERSION, sys.version_info[0], sys.version_info[1],
+                            hashlib.sha1(repr(sorted(NODETYPE_NAMES.items()))).hexdigest())
+
+
+def run_source(source, engine='tree', cache=None, env=None):
+    """
+    source의 form들을 평가하고 결과 노드를 하나씩 yield함.
+    cache가 있으면 같은 source는 다시 scan, parse하지 않고 vm은 bytecode를 그대로 씀.
+    :type source: str
+    :type cache: ProgramCache
+    :param env: top level Frame. None이면 GLOBAL_FRAME
+    """
+    if cache is None:
+        for result in run_program(StringIO(source), engine, env=env):
+            yield result
+        return
+    evaluate = ENGINES[engine]
+    for form in cache.load(source):
+        if engine == 'vm':
+            yield run_vm(form.code, env)
+        else:
+            yield evaluate(form.node, env)
+
+
+def dump_optimized(path):
+    """
+    Cute source 파일의 form들을 optimizer로 바꾼 결과를 실행하지 않고 출력함.
+    :type path: str
+    """
+    with open(path) as source_file:
+        for node in optimize_program(list(iter_forms(source_file))):
+            print print_node(node)
+
+
+class Interpreter(object):
+    """
+    global 환경을 따로 가지는 인터프리터. 여러 개를 thread에서 같이 돌려도 define이 섞이지 않음.
+    AST와 ProgramCache는 Interpreter끼리 같이 써도 되지만, Interpreter 하나는 한 thread에서만 씀.
+    """
+
+    def __init__(self, engine='tree'):
+        """
+        :param engine: ENGINES의 이름
+        """
+        self.engine = engine
+        self.global_env = KeywordTable()
+        self.frame = Frame([], None, self.global_env)
+
+    def evaluate(self, node, steps=None, timeout=None):
+        """
+        :type node: Node
+        :param steps: lambda 호출 수 제한. 넘으면 EvaluationLimitError
+        :param timeout: 초 단위 시간 제한. 넘으면 EvaluationLimitError
+        :return: 결과 노드
+        """
+        if steps is None and timeout is None:
+            return ENGINES[self.engine](node, self.frame)
+        self.global_env.budget = StepBudget(steps, timeout)
+        try:
+            return ENGINES[self.engine](node, self.frame)
+        finally:
+            self.global_env.budget = None
+
+    def run_source(self, source, cache=None):
+        """
+        source의 form들을 모두 평가하고 결과 노드의 list를 반환함.
+        :type source: str
+        :type cache: ProgramCache
+        """
+        return list(run_source(source, self.engine, cache, self.frame))
+
+    def lookup(self, name):
+        """
+        :return: name의 global 값. 없으면 None
+        """
+        binding = self.global_env.table.get(name)
+        if binding is not None:
+            return binding.value
+        return None
+
+
+# batch 평가. library를 한번 읽은 Interpreter를 fork한 worker process들이 나눠서 평가함.
+_batch_interpreter = None
+
+
+def _init_batch_worker(library, engine):
+    """
+    worker process 시작 시 실행됨. fork면 부모가 library를 읽어둔 Interpreter를 그대로 물려받고,
+    물려받지 못한 경우(spawn)에만 library를 다시 읽음.
+    """
+    global _batch_interpreter
+    if _batch_interpreter is None:
+        _batch_interpreter = _load_library(library, engine)
+
+
+def _load_library(library, engine):
+    interpreter = Interpreter(engine)
+    if library:
+        interpreter.run_source(library)
+    return interpreter
+
+
+def _evaluate_batch_item(source):
+    """
+    Test_method처럼 scan, parse, 평가, print_node를 거친 결과를 반환함.
+    :return: (결과 문자열, None) 또는 에러가 나면 (None, 에러 문자열)
+    """
+    try:
+        node = BasicPaser(scan_source(source)).parse_expr()
+        return print_node(_batch_interpreter.evaluate(node)), None
+    except Exception as error:
+        return None, '%s: %s' % (type(error).__name__, error)
+
+
+def evaluate_batch(sources, library=None, processes=None, chunksize=None, engine='tree'):
+    """
+    서로 상관없는 식들을 process pool에서 나눠서 평가함.
+    library의 define들은 pool을 만들기 전에 한번만 평가하고 worker들이 물려받음.
+    식 안에서 define한 이름은 같은 worker가 다음에 평가하는 식에서도 보임.
+    :param sources: 식 source 문자열들
+    :param library: 먼저 평가할 source. 보통 define들
+    :param processes: worker 수. None이면 cpu 수
+    :param chunksize: worker에 한번에 보낼 식 수. None이면 worker마다 4번쯤 나눠 보냄
+    :return: 입력 순서대로 (결과 문자열, 에러 문자열)의 list. 둘 중 하나는 None.
+        library 평가가 실패하면 모든 식의 에러가 그 library 에러임
+    """
+    global _batch_interpreter
+    sources = list(sources)
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, len(sources) // (processes * 4))
+    try:
+        _batch_interpreter = _load_library(library, engine)
+    except Exception as error:
+        # 결과가 식마다 하나씩인 것을 지키도록 pool 없이 모든 식에 library 에러를 돌려줌
+        library_error = 'library: %s: %s' % (type(error).__name__, error)
+        return [(None, library_error)] * len(sources)
+    pool = multiprocessing.Pool(processes, _init_batch_worker, (library, engine))
+    try:
+        return pool.map(_evaluate_batch_item, sources, chunksize)
+    finally:
+        pool.close()
+        pool.join()
+        _batch_interpreter = None
+
+
+# 평가 server. 한 줄에 식 하나를 받고 받은 순서대로 한 줄씩 결과를 돌려줌.
+# 응답을 기다리지 않고 여러 줄을 먼저 보내도 됨(pipelining).
+# 연결 하나가 session이고 session마다 Interpreter 하나를 계속 씀.
+
+class EvalRequestHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        server = self.server
+        interpreter = Interpreter(server.engine)
+        library_error = None
+        if server.library:
+            try:
+                interpreter.run_source(server.library)
+            except Exception as error:
+                # 요청마다 응답 한 줄씩인 순서를 지키도록 이 session의 요청들에 error로 응답함
+                library_error = 'error %s: library: %s' % (type(error).__name__, error)
+        for line in iter(self.rfile.readline, ''):
+            source = line.strip()
+            if not source:
+                continue
+            if library_error is not None:
+                self.wfile.write(library_error + '\n')
+                continue
+            try:
+                node = BasicPaser(scan_source(source)).parse_expr()
+                result = interpreter.evaluate(node, server.steps, server.timeout)
+                response = 'ok ' + print_node(result)
+            except Exception as error:
+                response = 'error %s: %s' % (type(error).__name__, error)
+            self.wfile.write(response + '\n')
+
+
+class _EvalServerMixIn(SocketServer.ThreadingMixIn):
+    daemon_threads = True
+
+    def setup_eval(self, engine, steps, timeout, library):
+        self.engine = engine
+        self.steps = steps
+        self.timeout = timeout
+        self.library = library
+
+
+class EvalServer(_EvalServerMixIn, SocketServer.TCPServer):
+    allow_reuse_address = True
+
+
+class UnixEvalServer(_EvalServerMixIn, SocketServer.UnixStreamServer):
+    pass
+
+
+def make_server(address, engine='tree', steps=1000000, timeout=10.0, library=None):
+    """
+    session마다 thread 하나로 식을 평가하는 server를 만듦. serve_forever로 실행함.
+    한 요청이 steps번 넘게 lambda를 부르거나 timeout초를 넘기면 그 요청만 error로 끝나서
+    멈추지 않는 lambda가 다른 session을 막지 못함.
+    :param address: (host, port)면 TCP, 문자열이면 Unix socket 경로
+    :param library: session을 시작할 때마다 먼저 평가할 source
+    """
+    if isinstance(address, str):
+        server = UnixEvalServer(address, EvalRequestHandler)
+    else:
+        server = EvalServer(address, EvalRequestHandler)
+    server.setup_eval(engine, steps, timeout, library)
+    return server
+
+
+def Test_method(input, engine='tree'):
+    test_cute = CuteScanner(input)
+    test_tokens = test_cute.tokenize_stream()
+    test_basic_paser = BasicPaser(test_tokens)
+    node = test_basic_paser.parse_expr()
+    cute_inter = ENGINES[engine](node)
+    print print_node(cute_inter)
+
+
+def Test_All(engine='tree'):
+    """
+    Test_method("(+ 1 2 )", engine)
+    Test_method("(- ( + 1 2 ) 4 )", engine)
+    Test_method("(* 3 2 )", engine)
+    Test_method("(/ 10 2 )", engine)
+    Test_method("(< 1 5 )", engine)
+    Test_method("(= 3 ( + 1 2 ) )", engine)
+    Test_method("(> 1 5 )", engine)
+    Test_method("(not #F )", engine)
+    Test_method("(null? '( 1 2 3) )", engine)
+    Test_method("(cond (#F 1) ( #T 2 ) )", engine)
+    Test_method("(cond ( ( null? ' ( 1 2 3 ) ) 1 ) ( ( > 100 10 ) 2 ) ( #T 3 ) )", engine)
+    """
+
+
+    print "1번"
+    Test_method("(define a 1)", engine)
+    print "2번"
+    Test_method("(define b '(1 2 3))", engine)
+    print "3번"
+    Test_method("(define c (- 5 2))", engine)
+    print "4번"
+    Test_method("(define d '(+ 2 3)", engine)
+    print "5번"
+    Test_method("(define test b)", engine)
+    Test_method("test", engine)
+    print "6번"
+    Test_method("(+ a 3)", engine)
+    print "7번"
+    Test_method("(define a 2)", engine)
+    Test_method("(* a 4)", engine)
+    print "8번"
+    Test_method("((lambda (x) (* x -2)) 3)", engine)
+    print "9번"
+    Test_method("((lambda (x) (/ x 2)) a)", engine)
+    print "10번"
+    Test_method("((lambda (x y) (* x y)) 3 5)", engine)
+    print "11번"
+    Test_method("((lambda (x y) (* x y)) a 5)", engine)
+    print "12번"
+    Test_method("(define plus1 (lambda (x) (+ x 1)))", engine)
+    Test_method("(plus1 3)", engine)
     print "13번"
-    Test_method("(define mul1 (lambda (x) (* x a)))")
-    Test_method("(mul1 a)")
+    Test_method("(define mul1 (lambda (x) (* x a)))", engine)
+    Test_method("(mul1 a)", engine)
     print "14번"
-    Test_method("(define plus2 (lambda (x) (+ (plus1 x) 1)))")
-    Test_method("(plus2 4)")
+    Test_method("(define plus2 (lambda (x) (+ (plus1 x) 1)))", engine)
+    Test_method("(plus2 4)", engine)
     print "15번"
-    Test_method("(define plus3 (lambda (x) (+ (plus1 x) a)))")
-    Test_method("(plus3 a)")
+    Test_method("(define plus3 (lambda (x) (+ (plus1 x) a)))", engine)
+    Test_method("(plus3 a)", engine)
     print "16번"
-    Test_method("(define mul2 (lambda (x) (* (plus1 x) -2)))")
-    Test_method("(mul2 7)")
+    Test_method("(define mul2 (lambda (x) (* (plus1 x) -2)))", engine)
+    Test_method("(mul2 7)", engine)
     print "17번"
-    Test_method("(define lastitem (lambda (ls) (cond ((null? (cdr ls)) (car ls)) (#T (lastitem (cdr ls))))))")
-    Test_method("(lastitem '(1 2 3 4 5))")
+    Test_method("(define lastitem (lambda (ls) (cond ((null? (cdr ls)) (car ls)) (#T (lastitem (cdr ls))))))", engine)
+    Test_method("(lastitem '(1 2 3 4 5))", engine)
     print "18번"
-    Test_method("(define square (lambda (x) (* x x)))")
-    Test_method("(define yourfunc (lambda (x func) (func x))")
-    Test_method("(yourfunc 3 square)")
+    Test_method("(define square (lambda (x) (* x x)))", engine)
+    Test_method("(define yourfunc (lambda (x func) (func x))", engine)
+    Test_method("(yourfunc 3 square)", engine)
     print "19번"
-    Test_method("(define square (lambda (x) (* x x)))")
-    Test_method("(define multwo (lambda (x) (* 2 x)))")  #
-    Test_method("(define newfun (lambda (fun1 fun2 x) (fun2 (fun1 x))))")
-    Test_method("(newfun square multwo 10)")
+    Test_method("(define square (lambda (x) (* x x)))", engine)
+    Test_method("(define multwo (lambda (x) (* 2 x)))", engine)  #
+    Test_method("(define newfun (lambda (fun1 fun2 x) (fun2 (fun1 x))))", engine)
+    Test_method("(newfun square multwo 10)", engine)
     print "20번"
-    Test_method("(define cube (lambda (n) (define sqrt (lambda (n) (* n n))) (* (sqrt n) n)))")
-    Test_method("(cube 4)")
-    Test_method("(sqrt 4)")
+    Test_method("(define cube (lambda (n) (define sqrt (lambda (n) (* n n))) (* (sqrt n) n)))", engine)
+    Test_method("(cube 4)", engine)
+    Test_method("(sqrt 4)", engine)
 
     while True:
         print ("> "),
         console = raw_input()
         print "... ",
-        Test_method(console)
-
-
-Test_All()
+        Test_method(console, engine)
+
+
+if __name__ == '__main__':
+    # -O: optimizer를 거쳐 실행, --dump-optimized: optimizer 결과만 출력
+    # --cache-dir=DIR: parse, compile 결과를 DIR에 저장해두고 다시 씀
+    # --serve=HOST:PORT 또는 --serve=PATH: 평가 server 실행
+    # --profile[=FILE]: tree 엔진 profile 표를 stderr에, collapsed stack을 FILE에 씀
+    options = [arg for arg in sys.argv[1:] if arg.startswith('-')]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('-')]
+    cache = None
+    serve = None
+    profiler = None
+    collapsed_path = None
+    for option in options:
+        if option.startswith('--cache-dir='):
+            cache = ProgramCache(directory=option[len('--cache-dir='):])
+        elif option.startswith('--serve='):
+            serve = option[len('--serve='):]
+        elif option == '--profile' or option.startswith('--profile='):
+            profiler = Profiler()
+            collapsed_path = option[len('--profile='):] or None
+    if serve is not None:
+        if ':' in serve:
+            host, port = serve.rsplit(':', 1)
+            serve = (host, int(port))
+        make_server(serve, *args).serve_forever()
+    elif args and args[-1] not in ENGINES:
+        if '--dump-optimized' in options:
+            dump_optimized(args[-1])
+        elif profiler is not None:
+            with profiler:
+                run_file(args[-1], *args[:-1], optimize='-O' in options, cache=cache)
+            sys.stderr.write(profiler.report() + '\n')
+            if collapsed_path is not None:
+                with open(collapsed_path, 'w') as collapsed_file:
+                    collapsed_file.write('\n'.join(profiler.collapsed_stacks()) + '\n')
+        else:
+            run_file(args[-1], *args[:-1], optimize='-O' in options, cache=cache)
+    else:
+        Test_All(*args)
 
@@ -0,0 +1,1190 @@
+# -*- coding: utf-8 -*-
+"""
+JDHU 인터프리터 성능 측정 스크립트.
+
+사용법: python benchmark.py [benchmark 이름 ...] [--json=FILE] [--baseline=FILE] [--threshold=0.10]
+이름을 주지 않으면 모든 benchmark를 실행함. --옵션들은 suite에서 씀.
+suite가 baseline보다 느려진 항목을 찾거나 optimizer-check, jit-check가 다른 결과를 찾으면
+종료 코드 1.
+"""
+import imp
+import inspect
+import json as json_module
+import multiprocessing
+import os
+import re
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import tempfile
+import timeit
+from multiprocessing.pool import ThreadPool
+
+import JDHU
+
+
+def parse(source):
+    """
+    source 문자열의 첫번째 form을 Node로 만들어 반환.
+    :type source: str
+    """
+    tokens = JDHU.CuteScanner(source).tokenize()
+    return JDHU.BasicPaser(tokens).parse_expr()
+
+
+def report(name, seconds, number):
+    print '%-40s %10.3f us/call' % (name, seconds / number * 1e6)
+
+
+def load_baseline_jdhu():
+    """
+    DISPATCH_TABLE을 만들기 전 커밋의 JDHU.py를 git에서 읽어 module로 만듦.
+    그 run_func는 호출될 때마다 primitive closure들과 table을 새로 만듦.
+    :return: module. git이나 그 커밋을 찾지 못하면 None
+    """
+    root = os.path.dirname(os.path.abspath(JDHU.__file__))
+    with open(os.devnull, 'w') as devnull:
+        def git(*args):
+            return subprocess.check_output(('git',) + args, cwd=root, stderr=devnull)
+        try:
+            revision = git('log', '--format=%H', '--reverse', '-S', 'DISPATCH_TABLE',
+                           '--', 'JDHU.py').split()[0]
+            source = git('show', revision + '^:JDHU.py')
+        except (OSError, subprocess.CalledProcessError, IndexError):
+            return None
+    # 예전 JDHU.py는 맨 끝에서 Test_All을 실행하므로 그 줄은 빼고 읽음
+    source = re.sub(r'(?m)^Test_All\(\)\s*$', '', source)
+    module = imp.new_module('JDHU_baseline')
+    exec compile(source, 'JDHU_baseline.py', 'exec') in module.__dict__
+    return module
+
+
+def bench_dispatch(number=200000):
+    """
+    list form 하나를 실행할 때 primitive를 찾는 비용. 예전 run_func와 비교함.
+    """
+    baseline = load_baseline_jdhu()
+    if baseline is None:
+        print '%-40s skipped (baseline JDHU.py not found in git)' % 'dispatch: run_func per call'
+    else:
+        node = baseline.BasicPaser(baseline.CuteScanner('( + 1 2 )').tokenize()).parse_expr()
+        op_code_node = node.value
+        seconds = timeit.timeit(lambda: baseline.run_func(op_code_node), number=number)
+        report('dispatch: run_func per call', seconds, number)
+        seconds = timeit.timeit(lambda: baseline.run_expr(node), number=number)
+        report('baseline run_expr (+ 1 2)', seconds, number)
+
+    op_code_node = parse('(+ 1 2)').value
+    seconds = timeit.timeit(lambda: JDHU.run_func(op_code_node), number=number)
+    report('dispatch: DISPATCH_TABLE', seconds, number)
+
+    node = parse('(+ 1 2)')
+    seconds = timeit.timeit(lambda: JDHU.run_expr(node), number=number)
+    report('run_expr (+ 1 2)', seconds, number)
+
+
+def define_all(sources, engine='tree'):
+    for source in sources:
+        JDHU.ENGINES[engine](parse(source))
+
+
+RECURSIVE_SUM = '(define sum (lambda (n) (cond ((= n 0) 0) (#T (+ n (sum (- n 1)))))))'
+LIST_LENGTH = '(define len (lambda (ls) (cond ((null? ls) 0) (#T (+ 1 (len (cdr ls)))))))'
+LAST_ITEM = '(define lastitem (lambda (ls) (cond ((null? (cdr ls)) (car ls)) ' \
+            '(#T (lastitem (cdr ls))))))'
+
+
+def quoted_list(count):
+    return "'(" + ' '.join(str(i) for i in range(count)) + ')'
+
+
+def bench_engines(number=200):
+    """
+    tree walker(run_expr), closure 엔진(run_compiled), bytecode VM(run_vm) 비교.
+    """
+    define_all([RECURSIVE_SUM, LIST_LENGTH, LAST_ITEM])
+    programs = [
+        ('(sum 50)', '(sum 50)'),
+        ('(len <40 items>)', '(len %s)' % quoted_list(40)),
+        ('(lastitem <40 items>)', '(lastitem %s)' % quoted_list(40)),
+    ]
+    for title, source in programs:
+        node = parse(source)
+        seconds = timeit.timeit(lambda: JDHU.run_expr(node), number=number)
+        report('tree    ' + title, seconds, number)
+
+        code = JDHU.compile_expr(parse(source))
+        seconds = timeit.timeit(lambda: code(JDHU.GLOBAL_FRAME), number=number)
+        report('closure ' + title, seconds, number)
+
+        code = JDHU.compile_bytecode(parse(source))
+        seconds = timeit.timeit(lambda: JDHU.run_vm(code), number=number)
+        report('vm      ' + title, seconds, number)
+
+
+def bench_bytecode(number=20):
+    """
+    python 재귀 한계를 넘는 깊은 재귀와, 직렬화된 bytecode를 다시 읽는 비용.
+    """
+    define_all([RECURSIVE_SUM])
+    code = JDHU.compile_bytecode(parse('(sum 10000)'))
+    seconds = timeit.timeit(lambda: JDHU.run_vm(code), number=number)
+    report('vm (sum 10000)', seconds, number)
+
+    source = '(define sum (lambda (n) (cond ((= n 0) 0) (#T (+ n (sum (- n 1)))))))'
+    data = JDHU.dump_bytecode(JDHU.compile_bytecode(parse(source)))
+    seconds = timeit.timeit(lambda: JDHU.compile_bytecode(parse(source)), number=number * 50)
+    report('scan + parse + compile', seconds, number * 50)
+    seconds = timeit.timeit(lambda: JDHU.load_bytecode(data), number=number * 50)
+    report('load_bytecode', seconds, number * 50)
+
+
+LIST_COUNT = '(define count (lambda (ls n) (cond ((null? ls) n) (#T (count (cdr ls) (+ n 1))))))'
+LIST_SUM = '(define total (lambda (ls n) (cond ((null? ls) n) (#T (total (cdr ls) (+ n (car ls)))))))'
+
+
+def make_list(count):
+    """
+    0 ~ count-1 을 가진 quote list 값을 parser를 거치지 않고 만듦.
+    """
+    head = JDHU.EMPTY_LIST
+    for value in reversed(xrange(count)):
+        head = JDHU.Pair(JDHU.Node(JDHU.TokenType.INT, value), head)
+    return head
+
+
+def bench_tail_calls(count=1000000):
+    """
+    tail call로 도는 Cute loop가 python stack을 쓰지 않고 긴 list를 도는지 확인.
+    """
+    define_all([LIST_COUNT, LIST_SUM])
+    JDHU.insert_table('big', make_list(count))
+    for title, source in [('count', '(count big 0)'), ('total', '(total big 0)')]:
+        node = parse(source)
+        start = timeit.default_timer()
+        result = JDHU.print_node(JDHU.run_expr(node))
+        seconds = timeit.default_timer() - start
+        print '%-40s %10.3f s  (%s)' % ('tree (%s <%d items>)' % (title, count), seconds, result)
+
+
+SAMPLE_FORMS = [
+    "(define a 1)",
+    "(define b '(1 2 3))",
+    "(define plus2 (lambda (x) (+ (plus1 x) 1)))",
+    "(define lastitem (lambda (ls) (cond ((null? (cdr ls)) (car ls)) (#T (lastitem (cdr ls))))))",
+    "(define newfun (lambda (fun1 fun2 x) (fun2 (fun1 x))))",
+    "((lambda (x y) (* x y)) a -5)",
+    "(cond ( ( null? ' ( 1 2 3 ) ) 1 ) ( ( > 100 10 ) 2 ) ( #T 3 ) )",
+]
+
+
+def generate_source(size):
+    """
+    SAMPLE_FORMS를 반복해서 size byte 이상의 source를 만듦.
+    """
+    block = '\n'.join(SAMPLE_FORMS) + '\n'
+    return block * (size // len(block) + 1)
+
+
+def report_throughput(name, seconds, size):
+    print '%-40s %10.3f MB/s' % (name, size / seconds / 1e6)
+
+
+def bench_scanner(size=2000000):
+    """
+    글자 단위 Scanner(tokenize)와 정규식 bulk scanner(tokenize_stream)의 처리량.
+    """
+    source = generate_source(size)
+    for title, scan in [('tokenize', lambda: JDHU.CuteScanner(source).tokenize()),
+                        ('tokenize_stream', lambda: JDHU.CuteScanner(source).tokenize_stream())]:
+        start = timeit.default_timer()
+        tokens = scan()
+        seconds = timeit.default_timer() - start
+        report_throughput('%s (%d tokens)' % (title, len(tokens)), seconds, len(source))
+
+
+def max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def write_program(path, count):
+    """
+    함수 define 몇개와 그 함수를 부르는 식 count개로 된 source 파일을 만듦.
+    """
+    with open(path, 'w') as program:
+        program.write('(define square (lambda (x) (* x x)))\n')
+        program.write('(define plus1 (lambda (x) (+ x 1)))\n')
+        for index in range(count):
+            program.write('(plus1 (square (- %d (+ 1 2))))\n' % index)
+
+
+def bench_loader(count=100000):
+    """
+    파일을 form 단위로 읽는 run_program과 파일 전체를 한번에 parse하는 경우의
+    속도와 최대 메모리 증가량.
+    """
+    fd, path = tempfile.mkstemp(suffix='.cute')
+    os.close(fd)
+    try:
+        write_program(path, count)
+        size = os.path.getsize(path)
+        rss = max_rss_mb()
+        start = timeit.default_timer()
+        with open(path) as source_file:
+            forms = sum(1 for _ in JDHU.run_program(source_file))
+        seconds = timeit.default_timer() - start
+        print '%-40s %10.3f s  %d forms, %.1f MB file, max rss +%.1f MB' % (
+            'run_program (streaming)', seconds, forms, size / 1e6, max_rss_mb() - rss)
+
+        rss = max_rss_mb()
+        start = timeit.default_timer()
+        with open(path) as source_file:
+            parser = JDHU.BasicPaser(JDHU.scan_source(source_file.read()))
+        nodes = []
+        node = parser.parse_expr()
+        while node is not None:
+            nodes.append(node)
+            node = parser.parse_expr()
+        for node in nodes:
+            JDHU.run_expr(node)
+        seconds = timeit.default_timer() - start
+        print '%-40s %10.3f s  %d forms, max rss +%.1f MB' % (
+            'read + parse whole file, then run', seconds, len(nodes), max_rss_mb() - rss)
+    finally:
+        os.remove(path)
+
+
+def bench_parser(count=1000000, depth=100000):
+    """
+    아주 긴 quote list와 아주 깊게 중첩된 list를 parse하는 시간.
+    """
+    for title, source in [('parse <%d items>' % count, quoted_list(count)),
+                          ('parse depth %d' % depth, "'" + '(' * depth + ')' * depth)]:
+        tokens = JDHU.scan_source(source)
+        start = timeit.default_timer()
+        node = JDHU.BasicPaser(tokens).parse_expr()
+        seconds = timeit.default_timer() - start
+        print '%-40s %10.3f s  %.2f us/token' % (title, seconds, seconds / len(tokens) * 1e6)
+        del node
+
+    define_all([LIST_COUNT])
+    node = parse('(count %s 0)' % quoted_list(count))
+    start = timeit.default_timer()
+    result = JDHU.print_node(JDHU.run_expr(node))
+    seconds = timeit.default_timer() - start
+    print '%-40s %10.3f s  (%s)' % ('run (count <%d items> 0)' % count, seconds, result)
+
+
+def count_nodes(func, node_class=JDHU.Node):
+    """
+    func를 실행하는 동안 만들어진 node_class(기본은 Closure 포함 Node) 객체의 수.
+    """
+    original_init = node_class.__init__
+    counter = [0]
+
+    def counting_init(self, *args, **kwargs):
+        counter[0] += 1
+        original_init(self, *args, **kwargs)
+
+    node_class.__init__ = counting_init
+    try:
+        func()
+    finally:
+        node_class.__init__ = original_init
+    return counter[0]
+
+
+def node_size(node):
+    size = sys.getsizeof(node)
+    if hasattr(node, '__dict__'):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def bench_nodes(count=100000):
+    """
+    Node 하나의 크기와, 큰 list를 parse하고 돌 때 만들어지는 Node 수.
+    """
+    source = quoted_list(count)
+    tokens = JDHU.scan_source(source)
+    node = JDHU.BasicPaser(tokens).parse_expr()
+    print '%-40s %10d bytes' % ('Node size (INT atom)', node_size(node.value.next.value))
+
+    parsed = count_nodes(lambda: JDHU.BasicPaser(tokens).parse_expr())
+    print '%-40s %10d nodes' % ('parse <%d items>' % count, parsed)
+
+    define_all([LIST_COUNT, LIST_SUM])
+    JDHU.insert_table('big', JDHU.run_expr(node))
+    for title, program in [('count', '(count big 0)'), ('total', '(total big 0)')]:
+        program_node = parse(program)
+        allocated = count_nodes(lambda: JDHU.run_expr(program_node))
+        print '%-40s %10d nodes  %.1f per item' % (
+            'run (%s <%d items>)' % (title, count), allocated, float(allocated) / count)
+
+    rss = max_rss_mb()
+    big = JDHU.BasicPaser(JDHU.scan_source(quoted_list(count * 10))).parse_expr()
+    print '%-40s %10.1f MB' % ('max rss for <%d items>' % (count * 10), max_rss_mb() - rss)
+    del big
+
+
+LIST_REVERSE = '(define rev (lambda (ls acc) (cond ((null? ls) acc) ' \
+               '(#T (rev (cdr ls) (cons (car ls) acc))))))'
+
+
+def bench_pairs(count=100000):
+    """
+    긴 list를 뒤집고 더할 때의 시간과 만들어지는 Node, Pair 수.
+    cons는 cell 하나, car/cdr는 아무것도 만들지 않아야 함.
+    """
+    define_all([LIST_REVERSE, LIST_SUM])
+    JDHU.insert_table('big', make_list(count))
+    for title, source in [('rev', "(rev big '())"), ('total', '(total big 0)')]:
+        for engine in ('tree', 'vm'):
+            node = parse(source)
+            run = JDHU.ENGINES[engine]
+            start = timeit.default_timer()
+            nodes = count_nodes(lambda: run(node))
+            seconds = timeit.default_timer() - start
+            pairs = count_nodes(lambda: run(node), JDHU.Pair)
+            print '%-40s %10.3f s  %d nodes, %d pairs' % (
+                '%-4s (%s <%d items>)' % (engine, title, count), seconds, nodes, pairs)
+
+
+def bench_globals(number=200):
+    """
+    global이 10개에서 10만개까지 define되어 있어도 define과 변수 참조 비용이 그대로인지 확인.
+    """
+    define_all([RECURSIVE_SUM])
+    defined = 0
+    for count in (10, 1000, 10000, 100000):
+        start = timeit.default_timer()
+        for index in range(defined, count):
+            JDHU.run_expr(JDHU.BasicPaser(
+                JDHU.scan_source('(define g%d %d)' % (index, index))).parse_expr())
+        if count > defined:
+            report('define, %d globals' % count,
+                   timeit.default_timer() - start, count - defined)
+        defined = count
+        node = parse('(+ g0 g%d)' % (count - 1))
+        seconds = timeit.timeit(lambda: JDHU.run_expr(node), number=number * 50)
+        report('tree (+ g0 g%d), %d globals' % (count - 1, count), seconds, number * 50)
+        node = parse('(sum 50)')
+        seconds = timeit.timeit(lambda: JDHU.run_expr(node), number=number)
+        report('tree (sum 50), %d globals' % count, seconds, number)
+
+
+def bench_call_cache(number=200):
+    """
+    global 함수 호출 위치의 inline cache 적중률과, 다시 define한 뒤의 비용.
+    """
+    define_all([RECURSIVE_SUM])
+    for engine in ('tree', 'closure', 'vm'):
+        run = JDHU.ENGINES[engine]
+        node = parse('(sum 50)')
+        stats = dict(JDHU.GLOBAL_FRAME.global_env.call_cache_stats)
+        seconds = timeit.timeit(lambda: run(node), number=number)
+        report('%-7s (sum 50)' % engine, seconds, number)
+        print '%-40s %10d hits %6d misses' % (
+            '', JDHU.GLOBAL_FRAME.global_env.call_cache_stats['hits'] - stats['hits'],
+            JDHU.GLOBAL_FRAME.global_env.call_cache_stats['misses'] - stats['misses'])
+
+    # 매번 다시 define하면 호출 위치마다 한번씩 miss가 남
+    define_node = parse(RECURSIVE_SUM)
+    node = parse('(sum 50)')
+
+    def redefine_and_run():
+        JDHU.run_expr(define_node)
+        JDHU.run_expr(node)
+    stats = dict(JDHU.GLOBAL_FRAME.global_env.call_cache_stats)
+    seconds = timeit.timeit(redefine_and_run, number=number)
+    report('tree    define + (sum 50)', seconds, number)
+    print '%-40s %10d hits %6d misses' % (
+        '', JDHU.GLOBAL_FRAME.global_env.call_cache_stats['hits'] - stats['hits'],
+        JDHU.GLOBAL_FRAME.global_env.call_cache_stats['misses'] - stats['misses'])
+
+
+OPTIMIZER_PROGRAM = [
+    '(define square (lambda (x) (* x x)))',
+    '(define plus1 (lambda (x) (+ x 1)))',
+    '(define loop (lambda (n acc) (cond ((= n 0) acc) ((> (* 2 3) 10) 0) '
+    '(#T (loop (- n (- (+ 1 2) 2)) (plus1 (+ acc (square n))))))))',
+]
+
+
+def bench_optimizer(number=50):
+    """
+    상수 계산, 죽은 cond clause 정리, plus1/square inline 전후의 실행 시간.
+    """
+    nodes = [parse(source) for source in OPTIMIZER_PROGRAM]
+    optimized = list(JDHU.optimize_program(nodes))
+    print '%-40s %s' % ('optimized loop', JDHU.print_node(optimized[-1]))
+    for engine in ('tree', 'closure', 'vm'):
+        run = JDHU.ENGINES[engine]
+        for title, program in [('plain', nodes), ('optimized', optimized)]:
+            for node in program:
+                run(node)
+            node = parse('(loop 300 0)')
+            seconds = timeit.timeit(lambda: run(node), number=number)
+            report('%-7s %-9s (loop 300 0) = %s' % (
+                engine, title, JDHU.print_node(run(node))), seconds, number)
+
+
+# optimizer가 결과를 바꾸면 안 되는 program들. Test_All의 form들도 같이 검사함
+OPTIMIZER_CASES = [
+    ['(define f (lambda (x) (+ x 1)))', '(f 1)',
+     '(define-memo f (lambda (x) (* x 100)))', '(f 1)'],
+    ['(define t (lambda (a b) (cond (a b) (#T 0))))', '(t #T 5)'],
+    # cond clause는 호출 form이 아니므로 접거나 inline하면 안 됨
+    ['(cond (+ 1 2))', '(define plus1 (lambda (x) (+ x 1)))', '(cond (plus1 3))',
+     '(cond ((< 1 2) (+ 1 2)) (#T 0))', '(cond ((plus1 3) 1) (#T (plus1 (* 2 3))))'],
+]
+
+
+def test_all_forms():
+    """
+    JDHU.Test_All이 Test_method로 실행하는 form들.
+    """
+    return re.findall(r'Test_method\("(.*?)", engine\)', inspect.getsource(JDHU.Test_All))
+
+
+def run_forms(nodes, engine, jit_threshold=None):
+    """
+    새 Interpreter에서 form들을 차례로 실행하고, form마다 출력과 결과를 문자열로 모음.
+    closure 결과는 optimize된 body가 출력되므로 내용 대신 closure라는 것만 남김.
+    :param jit_threshold: None이 아니면 이 호출 수로 JitCompiler를 붙임
+    """
+    frame = JDHU.Interpreter(engine).frame
+    if jit_threshold is not None:
+        frame.global_env.jit = JDHU.JitCompiler(frame.global_env, jit_threshold)
+    outputs = []
+    stdout = sys.stdout
+    for node in nodes:
+        sys.stdout = JDHU.StringIO()
+        try:
+            value = JDHU.ENGINES[engine](node, frame)
+            result = '#<closure>' if isinstance(value, JDHU.Closure) else JDHU.print_node(value)
+        except Exception as error:
+            result = '%s: %s' % (error.__class__.__name__, error)
+        finally:
+            printed, sys.stdout = sys.stdout.getvalue(), stdout
+        outputs.append(printed + result)
+    return outputs
+
+
+def check_optimizer():
+    """
+    optimizer를 거친 program과 그대로의 program을 엔진마다 실행해서 form별 결과를 비교함.
+    :return: 결과가 다른 (엔진, form, 그대로, optimize) 목록
+    """
+    programs = [test_all_forms()] + OPTIMIZER_CASES
+    mismatches = []
+    for engine in sorted(JDHU.ENGINES):
+        for sources in programs:
+            nodes = [parse(source) for source in sources]
+            plain = run_forms(nodes, engine)
+            try:
+                optimized = run_forms(list(JDHU.optimize_program(nodes)), engine)
+            except Exception as error:
+                # optimizer가 실패하면 program 전체를 다른 결과로 셈
+                mismatches.append((engine, sources[0], plain[0], '%s: %s' % (
+                    error.__class__.__name__, error)))
+                continue
+            for source, expected, actual in zip(sources, plain, optimized):
+                if expected != actual:
+                    mismatches.append((engine, source, expected, actual))
+    for engine, source, expected, actual in mismatches:
+        print '%-40s %r -> %r' % ('%s %s' % (engine, source), expected, actual)
+    print '%-40s %d programs, %d mismatches' % (
+        'optimizer check', len(programs) * len(JDHU.ENGINES), len(mismatches))
+    return mismatches
+
+
+# tiered 엔진이 tree 엔진과 같은 결과를 내야 하는 program들. 바로 compile되게 해서 실행함
+JIT_CASES = [
+    ['(define fib %s)' % '(lambda (n) (cond ((< n 2) n) (#T (+ (fib (- n 1)) (fib (- n 2))))))',
+     '(fib 15)'],
+    ['(define loop (lambda (n acc) (cond ((= n 0) acc) (#T (loop (- n 1) (+ acc n))))))',
+     '(loop 100000 0)'],
+    ['(define ev (lambda (n) (cond ((= n 0) #T) (#T (od (- n 1))))))',
+     '(define od (lambda (n) (cond ((= n 0) #F) (#T (ev (- n 1))))))', '(ev 50001)'],
+    ['(define g (lambda (x) (cond (x 1) (#T 2))))', '(g 1)', '(g 2)'],
+    ['(define a 5)', '(define useg (lambda (x) (+ x a)))', '(useg 1)', '(define a 100)',
+     '(useg 1)'],
+    ['(define rev (lambda (ls acc) (cond ((null? ls) acc) (#T (rev (cdr ls) (cons (car ls) acc))))))',
+     "(rev '(1 2 (3 4) 5) '())"],
+    # 숫자로 compile된 뒤 vector 인자로 불리면 guard가 실패해도 tail call이 stack을 쌓지 않아야 함
+    ['(define f (lambda (v n) (cond ((= n 0) (+ v 1)) (#T (f v (- n 1))))))', '(f 1 3)',
+     "(f (list->vector '(1 2)) 5000)", '(f 1 3)'],
+    ['(define sumv (lambda (v n) (cond ((= n 0) v) (#T (+ 1 (sumv v (- n 1)))))))', '(sumv 1 3)',
+     "(sumv (list->vector '(1 2)) 50)"],
+]
+
+
+def check_jit():
+    """
+    JIT_CASES를 tree 엔진과 바로 compile하는 tiered 엔진으로 실행해서 form별 결과를 비교함.
+    :return: 결과가 다른 (form, tree, tiered) 목록
+    """
+    mismatches = []
+    for sources in JIT_CASES:
+        nodes = [parse(source) for source in sources]
+        expected = run_forms(nodes, 'tree')
+        actual = run_forms(nodes, 'tiered', jit_threshold=0)
+        for source, tree, tiered in zip(sources, expected, actual):
+            if tree != tiered:
+                mismatches.append((source, tree, tiered))
+    for source, tree, tiered in mismatches:
+        print '%-40s %r -> %r' % (source, tree, tiered)
+    print '%-40s %d programs, %d mismatches' % ('jit check', len(JIT_CASES), len(mismatches))
+    return mismatches
+
+
+FIB = '(lambda (n) (cond ((< n 2) n) (#T (+ (fib (- n 1)) (fib (- n 2))))))'
+
+
+def bench_memo(number=3):
+    """
+    fib를 그냥 define했을 때와 define-memo로 memoize했을 때의 비교.
+    cache 크기를 줄이면 evict가 늘어나는 것도 확인함.
+    """
+    node = parse('(fib 20)')
+    for engine in ('tree', 'closure', 'vm'):
+        run = JDHU.ENGINES[engine]
+        run(parse('(define fib %s)' % FIB))
+        seconds = timeit.timeit(lambda: run(node), number=number)
+        report('%-7s define      (fib 20)' % engine, seconds, number)
+
+        # 매번 다시 define-memo해서 빈 cache부터 시작함
+        define_node = parse('(define-memo fib %s)' % FIB)
+        seconds = timeit.timeit(lambda: (run(define_node), run(node)), number=number)
+        report('%-7s define-memo (fib 20)' % engine, seconds, number)
+
+    for size in (1024, 4):
+        JDHU.MEMO_CACHE_SIZE = size
+        JDHU.run_expr(parse('(define-memo fib %s)' % FIB))
+        JDHU.run_expr(parse('(fib 20)'))
+        hits, misses, evictions, _, stored = JDHU.memo_stats()['fib']
+        print '%-40s %6d hits %6d misses %6d evictions %4d stored' % (
+            'tree (fib 20), cache size %d' % size, hits, misses, evictions, stored)
+    JDHU.MEMO_CACHE_SIZE = 1024
+
+
+def bench_profiler(number=3):
+    """
+    profiler가 꺼져 있을 때와 켜져 있을 때의 tree 엔진 (fib 18), 켰을 때의 profile 표.
+    """
+    JDHU.run_expr(parse('(define fib %s)' % FIB))
+    node = parse('(fib 18)')
+    seconds = timeit.timeit(lambda: JDHU.run_expr(node), number=number)
+    report('profiler off (fib 18)', seconds, number)
+    profiler = JDHU.Profiler()
+    seconds = timeit.timeit(lambda: JDHU.profile_expr(node, profiler=profiler), number=number)
+    report('profiler on  (fib 18)', seconds, number)
+    print profiler.report()
+    for line in profiler.collapsed_stacks()[:4]:
+        print line
+
+
+HOT_NUMERIC = [
+    '(define square (lambda (x) (* x x)))',
+    '(define cube (lambda (n) (* (square n) n)))',
+    '(define plus2 (lambda (x) (+ x 2)))',
+    '(define sumcubes (lambda (n acc) (cond ((= n 0) acc) '
+    '(#T (sumcubes (- n 1) (+ acc (cube (plus2 n))))))))',
+]
+
+
+def bench_tiered(count=20000, number=3):
+    """
+    작은 산술 lambda들을 많이 부르는 loop를 tree 엔진과 tiered 실행으로 비교.
+    """
+    node = parse('(sumcubes %d 0)' % count)
+    for engine in ('tree', 'tiered'):
+        interpreter = JDHU.Interpreter(engine)
+        interpreter.run_source('\n'.join(HOT_NUMERIC))
+        result = JDHU.print_node(interpreter.evaluate(node))
+        seconds = timeit.timeit(lambda: interpreter.evaluate(node), number=number)
+        report('%-7s (sumcubes %d)' % (engine, count), seconds, number)
+    jit = interpreter.global_env.jit
+    print '%-40s %d compiled, %d deopts  (%s)' % ('tiered', jit.compiled, jit.deopts, result)
+    interpreter.run_source('(define square (lambda (x) (* x (+ x 0))))')
+    interpreter.evaluate(node)
+    print '%-40s %d compiled, %d deopts' % ('after redefining square', jit.compiled, jit.deopts)
+
+
+def nested_list(depth):
+    """
+    '((((...)))) 처럼 depth번 중첩된 Pair list.
+    """
+    value = JDHU.EMPTY_LIST
+    for _ in xrange(depth):
+        value = JDHU.Pair(value, JDHU.EMPTY_LIST)
+    return value
+
+
+def bench_serializer(count=1000000, depth=100000):
+    """
+    큰 결과 list를 문자열, file, 조각 generator로 출력하는 시간.
+    """
+    for title, value in [('%d items' % count, make_list(count)),
+                         ('depth %d' % depth, nested_list(depth))]:
+        timings = [
+            ('print_node', lambda: JDHU.print_node(value)),
+            ('write_node StringIO', lambda: JDHU.write_node(value, JDHU.StringIO())),
+            ('iter_node', lambda: sum(1 for _ in JDHU.iter_node(value))),
+        ]
+        for name, func in timings:
+            start = timeit.default_timer()
+            func()
+            print '%-40s %10.3f s' % ('%s (%s)' % (name, title), timeit.default_timer() - start)
+        with tempfile.TemporaryFile() as out:
+            start = timeit.default_timer()
+            JDHU.write_node(value, out)
+            seconds = timeit.default_timer() - start
+            print '%-40s %10.3f s  %d bytes' % ('write_node file (%s)' % title, seconds, out.tell())
+    print '%-40s %10.1f MB' % ('max rss', max_rss_mb())
+
+
+LIST_SCALE = '(define scale (lambda (ls k acc) (cond ((null? ls) acc) ' \
+    '(#T (scale (cdr ls) k (cons (* k (car ls)) acc))))))'
+
+
+def bench_vectors(count=200000):
+    """
+    숫자 list를 cdr로 도는 Cute 함수와 vector primitive의 합, 곱, 최대값 비교.
+    numpy가 없으면 vector는 array.array와 python loop로 계산됨.
+    """
+    print '%-40s %s' % ('vector backend', 'numpy' if JDHU.numpy is not None else 'array')
+    define_all([LIST_SUM, LIST_SCALE])
+    JDHU.insert_table('big', make_list(count))
+    JDHU.run_expr(parse('(define vec (list->vector big))'))
+    for title, source in [('list total', '(total big 0)'),
+                          ('vector-sum', '(vector-sum vec)'),
+                          ('list scale', "(car (scale big 3 '()))"),
+                          ('vector *', '(vector-ref (* vec 3) 0)'),
+                          ('vector + vector', '(vector-ref (+ vec vec) 1)'),
+                          ('vector-sum (< vec 1000)', '(vector-sum (< vec 1000))'),
+                          ('vector-max', '(vector-max vec)'),
+                          ('list->vector', '(vector-length (list->vector big))')]:
+        node = parse(source)
+        start = timeit.default_timer()
+        result = JDHU.print_node(JDHU.run_expr(node))
+        seconds = timeit.default_timer() - start
+        print '%-40s %10.3f s  (%s)' % ('%s <%d items>' % (title, count), seconds, result)
+
+
+STREAM_PROGRAM = [
+    '(define ints (lambda (n) (stream-cons n (ints (+ n 1)))))',
+    '(define sq (lambda (x) (* x x)))',
+    '(define even (lambda (n) (= (* (/ n 2) 2) n)))',
+    '(define snth (lambda (s n) (cond ((= n 0) (stream-car s)) '
+    '(#T (snth (stream-cdr s) (- n 1))))))',
+]
+
+
+def sample_rss(func, interval=1.0):
+    """
+    func를 실행하는 동안 다른 thread에서 interval초마다 max rss를 기록함.
+    :return: (func의 결과, [(경과 시간, max rss MB)])
+    """
+    samples = []
+    done = threading.Event()
+    start = timeit.default_timer()
+
+    def sample():
+        while not done.wait(interval):
+            samples.append((timeit.default_timer() - start, max_rss_mb()))
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    try:
+        result = func()
+    finally:
+        done.set()
+        sampler.join()
+    samples.append((timeit.default_timer() - start, max_rss_mb()))
+    return result, samples
+
+
+def bench_streams(count=10000000, checkpoints=10):
+    """
+    Cute program 안에서 끝이 없는 stream (stream-map sq (stream-filter even (ints 0)))의
+    count/2번째 원소를 snth로 찾음. ints가 count개의 원소를 만드는 동안 max rss를 봄.
+    지나간 원소는 참조가 없으므로 처리한 원소 수와 관계없이 메모리가 일정해야 함.
+    """
+    define_all(STREAM_PROGRAM)
+    node = parse('(snth (stream-map sq (stream-filter even (ints 0))) %d)' % (count // 2 - 1))
+    rss = max_rss_mb()
+    result, samples = sample_rss(lambda: JDHU.run_expr(node))
+    step = max(1, len(samples) // checkpoints)
+    for index, (seconds, sample) in enumerate(samples[step - 1::step]):
+        print '%-40s %10.3f s  max rss +%.1f MB' % (
+            'stream pipeline sample %d' % (index + 1), seconds, sample - rss)
+    print '%-40s %10.3f s  max rss +%.1f MB  (%s)' % (
+        'stream pipeline <%d ints>' % count, samples[-1][0], samples[-1][1] - rss,
+        JDHU.print_node(result))
+
+    # 비교: global 변수가 처음 원소를 잡고 있으면 지나간 원소들이 모두 남음
+    define_all(['(define kept (ints 0))'])
+    node = parse('(snth kept %d)' % (count // 100))
+    rss = max_rss_mb()
+    JDHU.run_expr(node)
+    print '%-40s %10s  max rss +%.1f MB' % (
+        'head kept <%d ints>' % (count // 100), '', max_rss_mb() - rss)
+
+
+TABLE_FILL = '(define fill (lambda (t n) (cond ((= n 0) t) ' \
+    '(#T (fill (table-set! t n (* n n)) (- n 1))))))'
+TABLE_LOOKUPS = '(define tlookups (lambda (n t acc) (cond ((= n 0) acc) ' \
+    '(#T (tlookups (- n 1) t (+ acc (table-ref t n)))))))'
+LIST_NTH = '(define nth (lambda (ls k) (cond ((= k 0) (car ls)) (#T (nth (cdr ls) (- k 1))))))'
+INDEX_SUM = '(define isum (lambda (ls k acc) (cond ((< k 0) acc) ' \
+    '(#T (isum ls (- k 1) (+ acc (nth ls k)))))))'
+VECTOR_SUM = '(define vsum (lambda (v k acc) (cond ((< k 0) acc) ' \
+    '(#T (vsum v (- k 1) (+ acc (vector-ref v k)))))))'
+VECTOR_FILL = '(define vfill (lambda (v k) (cond ((< k 0) v) ' \
+    '(#T (vfill (vector-set! v k (* k 2)) (- k 1))))))'
+
+
+def bench_tables(size=1000):
+    """
+    alist를 assq로 찾는 것과 table-ref, list를 nth로 찾는 것과 vector-ref 비교.
+    key n개를 모두 한번씩 찾으므로 alist, list는 O(n^2), table, vector는 O(n)임.
+    """
+    define_all(SUITE_PROGRAMS['assq'] + SUITE_PROGRAMS['build'] + [
+        TABLE_FILL, TABLE_LOOKUPS, LIST_NTH, INDEX_SUM, VECTOR_SUM, VECTOR_FILL,
+        '(define al %s)' % alist_source(size),
+        '(define tbl (fill (make-table) %d))' % size,
+        "(define ls (build %d '()))" % size,
+        '(define vec (list->vector ls))'])
+    for title, source in [('alist assq', '(lookups %d al 0)' % size),
+                          ('table-ref', '(tlookups %d tbl 0)' % size),
+                          ('table-set! (fill)', '(table-count (fill (make-table) %d))' % size),
+                          ('list nth', '(isum ls %d 0)' % (size - 1)),
+                          ('vector-ref', '(vsum vec %d 0)' % (size - 1)),
+                          ('vector-set! (fill)', '(vector-length (vfill vec %d))' % (size - 1))]:
+        node = parse(source)
+        start = timeit.default_timer()
+        result = JDHU.print_node(JDHU.run_expr(node))
+        seconds = timeit.default_timer() - start
+        print '%-40s %10.3f s  (%s)' % ('%s <%d keys>' % (title, size), seconds, result)
+
+
+def bench_program_cache(size=200000):
+    """
+    같은 source를 다시 실행할 때 ProgramCache가 scan, parse, compile을 얼마나 줄이는지.
+    cold는 cache 없음, disk warm은 다시 시작한 worker처럼 새 ProgramCache로 파일에서 읽음.
+    """
+    source = generate_source(size)
+    directory = tempfile.mkdtemp()
+    try:
+        start = timeit.default_timer()
+        forms = len(list(JDHU.iter_forms(JDHU.StringIO(source))))
+        print '%-40s %10.3f s  %d forms, %d bytes' % (
+            'scan + parse only', timeit.default_timer() - start, forms, len(source))
+        timings = [
+            ('cold (no cache)', lambda: None),
+            ('cold, filling cache', lambda: JDHU.ProgramCache(directory=directory)),
+            ('disk warm (new ProgramCache)', lambda: JDHU.ProgramCache(directory=directory)),
+        ]
+        cache = None
+        for title, make_cache in timings:
+            cache = make_cache()
+            start = timeit.default_timer()
+            results = list(JDHU.run_source(source, 'vm', cache))
+            print '%-40s %10.3f s  %d results' % (
+                title + ', vm', timeit.default_timer() - start, len(results))
+        for engine in ('vm', 'tree'):
+            start = timeit.default_timer()
+            results = list(JDHU.run_source(source, engine, cache))
+            print '%-40s %10.3f s  %d results' % (
+                'memory warm, ' + engine, timeit.default_timer() - start, len(results))
+        print '%-40s %10d memory %6d disk %6d misses' % (
+            'last cache', cache.memory_hits, cache.disk_hits, cache.misses)
+    finally:
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+SHARED_PROGRAM = '''
+(define scale (lambda (n) (* n base)))
+(define total (lambda (ls n) (cond ((null? ls) n) (#T (total (cdr ls) (+ n (scale (car ls))))))))
+(define-memo fib (lambda (n) (cond ((< n 2) base) (#T (+ (fib (- n 1)) (fib (- n 2)))))))
+(total '(1 2 3 4 5 6 7 8 9 10) 0)
+(fib 15)
+'''
+
+
+def bench_interpreters(count=32, threads=8, rounds=20):
+    """
+    Interpreter count개를 thread pool에서 같이 돌림. 모두 같은 ProgramCache의 AST를 쓰지만
+    base를 각자 다르게 define하므로 결과가 자기 base로만 계산되어야 함.
+    """
+    cache = JDHU.ProgramCache()
+    engines = sorted(JDHU.ENGINES)
+
+    def run(index):
+        interpreter = JDHU.Interpreter(engines[index % len(engines)])
+        interpreter.evaluate(parse('(define base %d)' % index))
+        results = []
+        for _ in range(rounds):
+            results.append(tuple(JDHU.print_node(result) for result in
+                                 interpreter.run_source(SHARED_PROGRAM, cache)[-2:]))
+        return results
+
+    # base가 b일 때 (total ...)은 55*b, (fib 15)는 fib(16)*b = 987*b
+    expected = [[(str(55 * index), str(987 * index))] * rounds for index in range(count)]
+    pool = ThreadPool(threads)
+    try:
+        start = timeit.default_timer()
+        results = pool.map(run, range(count))
+        seconds = timeit.default_timer() - start
+    finally:
+        pool.close()
+        pool.join()
+    wrong = sum(1 for result, answer in zip(results, expected) if result != answer)
+    print '%-40s %10.3f s  %d runs, %d interpreters with wrong results' % (
+        '%d interpreters on %d threads' % (count, threads), seconds, count * rounds, wrong)
+    if wrong:
+        raise AssertionError('interpreter results are not isolated')
+
+
+def bench_batch(count=400):
+    """
+    evaluate_batch를 worker 1개부터 cpu 수까지 늘려가며 돌림.
+    같은 식들을 한 process에서 차례로 평가한 시간과 비교함.
+    """
+    library = '(define fib %s)' % FIB
+    sources = ['(fib %d)' % (12 + index % 3) for index in range(count)]
+
+    interpreter = JDHU.Interpreter()
+    interpreter.run_source(library)
+    start = timeit.default_timer()
+    expected = [JDHU.print_node(interpreter.evaluate(parse(source))) for source in sources]
+    serial = timeit.default_timer() - start
+    print '%-40s %10.3f s' % ('serial, %d items' % count, serial)
+
+    for processes in range(1, multiprocessing.cpu_count() + 1):
+        start = timeit.default_timer()
+        results = JDHU.evaluate_batch(sources, library, processes)
+        seconds = timeit.default_timer() - start
+        errors = sum(1 for result, error in results if error is not None)
+        wrong = sum(1 for (result, _), answer in zip(results, expected) if result != answer)
+        print '%-40s %10.3f s  x%.2f, %d errors, %d wrong' % (
+            'evaluate_batch, %d processes' % processes, seconds, serial / seconds, errors, wrong)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def bench_server(clients=8, requests=400, depth=8):
+    """
+    평가 server에 client 여러 개가 depth개씩 pipelining해서 요청을 보내는 load generator.
+    멈추지 않는 lambda를 계속 보내는 client 하나를 같이 돌려도 다른 client가 끝나는지 확인함.
+    """
+    library = '(define fib %s)\n(define loop (lambda (n) (loop (+ n 1))))' % FIB
+    server = JDHU.make_server(('127.0.0.1', 0), steps=20000, timeout=2.0, library=library)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    address = server.server_address
+    sources = ['(fib 8)', '(+ 1 2)', "(car '(1 2 3))", '(fib 5)']
+    latencies = []
+    runaway = []
+    lock = threading.Lock()
+
+    def client(index):
+        connection = socket.create_connection(address)
+        responses = connection.makefile('rb')
+        measured = []
+        for window in range(0, requests, depth):
+            sent = timeit.default_timer()
+            connection.sendall(''.join(sources[(index + number) % len(sources)] + '\n'
+                                       for number in range(window, window + depth)))
+            for _ in range(depth):
+                if not responses.readline().startswith('ok'):
+                    raise AssertionError('request failed')
+                measured.append(timeit.default_timer() - sent)
+        connection.close()
+        with lock:
+            latencies.extend(measured)
+
+    def runaway_client():
+        connection = socket.create_connection(address)
+        connection.sendall('(loop 0)\n' * 3)
+        responses = connection.makefile('rb')
+        runaway.extend(responses.readline().strip() for _ in range(3))
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    threads.append(threading.Thread(target=runaway_client))
+    start = timeit.default_timer()
+    for client_thread in threads:
+        client_thread.start()
+    for client_thread in threads:
+        client_thread.join()
+    seconds = timeit.default_timer() - start
+    server.shutdown()
+    server.server_close()
+
+    print '%-40s %10.1f req/s  (%d requests, %d clients, depth %d)' % (
+        'throughput', len(latencies) / seconds, len(latencies), clients, depth)
+    print '%-40s %10.3f ms' % ('p50 latency', percentile(latencies, 0.50) * 1e3)
+    print '%-40s %10.3f ms' % ('p99 latency', percentile(latencies, 0.99) * 1e3)
+    print '%-40s %s' % ('runaway client', runaway[0] if runaway else 'no response')
+
+
+# 표준 benchmark 묶음. (이름, 먼저 실행할 form들, 시간을 잴 식)
+SUITE_LIST_SIZE = 5000
+SUITE_ALIST_SIZE = 200
+SUITE_COND_SIZE = 64
+SUITE_PROGRAMS = {
+    'fib': ['(define fib %s)' % FIB],
+    'tak': ['(define tak (lambda (x y z) (cond ((not (< y x)) z) '
+            '(#T (tak (tak (- x 1) y z) (tak (- y 1) z x) (tak (- z 1) x y))))))'],
+    'ack': ['(define ack (lambda (m n) (cond ((= m 0) (+ n 1)) '
+            '((= n 0) (ack (- m 1) 1)) (#T (ack (- m 1) (ack m (- n 1)))))))'],
+    'build': ['(define build (lambda (n acc) (cond ((= n 0) acc) '
+              '(#T (build (- n 1) (cons n acc))))))'],
+    'rev': [LIST_REVERSE],
+    'total': [LIST_SUM],
+    'assq': ['(define assq (lambda (k al) (cond ((null? al) (quote ())) '
+             '((eq? k (car (car al))) (car al)) (#T (assq k (cdr al))))))',
+             '(define lookups (lambda (n al acc) (cond ((= n 0) acc) '
+             '(#T (lookups (- n 1) al (+ acc (car (cdr (assq n al)))))))))'],
+}
+
+
+def alist_source(count):
+    return "'(%s)" % ' '.join('(%d %d)' % (key, key * key) for key in range(1, count + 1))
+
+
+def deep_cond_source(count):
+    """
+    clause가 count개인 cond로 n을 분류하는 함수와, 0부터 count-1까지 모두 분류해 더하는 함수.
+    """
+    clauses = ' '.join('((= n %d) %d)' % (index, index * 2) for index in range(count))
+    return ['(define classify (lambda (n) (cond %s (#T -1))))' % clauses,
+            '(define classify-all (lambda (n acc) (cond ((< n 0) acc) '
+            '(#T (classify-all (- n 1) (+ acc (classify n)))))))']
+
+
+SUITE = [
+    ('fib', SUITE_PROGRAMS['fib'], '(fib 16)'),
+    ('tak', SUITE_PROGRAMS['tak'], '(tak 12 8 4)'),
+    ('ackermann', SUITE_PROGRAMS['ack'], '(ack 2 40)'),
+    ('list-build', SUITE_PROGRAMS['build'], "(build %d '())" % SUITE_LIST_SIZE),
+    ('list-reverse', SUITE_PROGRAMS['build'] + SUITE_PROGRAMS['rev'] + [
+        "(define big (build %d '()))" % SUITE_LIST_SIZE], "(rev big '())"),
+    ('list-sum', SUITE_PROGRAMS['build'] + SUITE_PROGRAMS['total'] + [
+        "(define big (build %d '()))" % SUITE_LIST_SIZE], '(total big 0)'),
+    ('alist-lookup', SUITE_PROGRAMS['assq'] + [
+        '(define table %s)' % alist_source(SUITE_ALIST_SIZE)],
+     '(lookups %d table 0)' % SUITE_ALIST_SIZE),
+    ('deep-cond', deep_cond_source(SUITE_COND_SIZE),
+     '(classify-all %d 0)' % (SUITE_COND_SIZE * 4)),
+]
+
+
+def count_allocations(func):
+    """
+    func를 실행하는 동안 만들어진 Node, Pair 수. Profiler의 할당 counter를 씀.
+    """
+    profiler = JDHU.Profiler()
+    with profiler:
+        func()
+    return profiler.allocated
+
+
+# 한 번 잰 시간이 이보다 짧은 workload는 여러 번 실행해서 잼. 짧은 workload의 잡음을 줄임
+SUITE_MIN_TIME = 0.2
+# 이보다 작은 메모리 증가는 regression으로 보지 않음
+SUITE_MEMORY_SLACK_MB = 1.0
+
+
+def run_isolated(func):
+    """
+    fork한 process에서 func를 실행하고 결과를 돌려받음.
+    max rss가 앞에서 실행한 workload의 최대값에 가려지지 않음.
+    """
+    reader, writer = multiprocessing.Pipe(False)
+
+    def child():
+        try:
+            writer.send(func())
+        except Exception as error:
+            writer.send(error)
+
+    process = multiprocessing.Process(target=child)
+    process.start()
+    writer.close()
+    try:
+        result = reader.recv()
+    finally:
+        process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def measure(func, repeat, setup=None):
+    """
+    func 한 번의 가장 짧은 시간, 할당 수, 실행하는 동안 늘어난 max rss를 잼.
+    한 번에 SUITE_MIN_TIME보다 짧게 걸리면 그만큼 여러 번 실행한 시간을 나눔.
+    :param setup: 메모리를 재기 전에 한번 실행할 함수. 반환값은 'result'로 저장됨
+    """
+    rss = max_rss_mb()
+    result = {}
+    if setup is not None:
+        result['result'] = setup()
+    seconds = timeit.timeit(func, number=1)
+    number = max(1, int(SUITE_MIN_TIME / seconds) + 1) if seconds < SUITE_MIN_TIME else 1
+    result['seconds'] = min(timeit.repeat(func, number=number, repeat=repeat)) / number
+    result['number'] = number
+    result['allocations'] = count_allocations(func)
+    result['memory_mb'] = max_rss_mb() - rss
+    return result
+
+
+def run_suite(engines=('tree', 'closure', 'vm', 'tiered'), repeat=5, source_size=500000):
+    """
+    SUITE의 식들을 엔진마다 따로 fork한 process에서 repeat번 돌려 가장 빠른 시간,
+    할당 수, 늘어난 max rss를 잼. scanner, parser는 생성한 source의 처리 시간을 잼.
+    :return: 'workload/engine' -> {'seconds', 'number', 'allocations', 'memory_mb', ..}
+    """
+    results = {}
+    for name, setup, expression in SUITE:
+        for engine in engines:
+            def workload(setup=setup, expression=expression, engine=engine):
+                interpreter = JDHU.Interpreter(engine)
+                node = parse(expression)
+                run = lambda: interpreter.evaluate(node)
+
+                def first_run():
+                    interpreter.run_source('\n'.join(setup))
+                    return JDHU.print_node(run())[:40]
+                return measure(run, repeat, first_run)
+            try:
+                results['%s/%s' % (name, engine)] = run_isolated(workload)
+            except RuntimeError:
+                # closure 엔진은 tail call도 python 재귀라서 긴 loop는 돌지 못함
+                print '%-24s skipped (recursion limit)' % ('%s/%s' % (name, engine))
+
+    source = generate_source(source_size)
+    for name, func in [('scanner', lambda: JDHU.scan_source(source)),
+                       ('parser', lambda: list(JDHU.iter_forms(JDHU.StringIO(source))))]:
+        results[name] = run_isolated(lambda func=func: measure(func, repeat))
+        results[name]['bytes'] = len(source)
+    return results
+
+
+def compare_results(results, baseline, threshold):
+    """
+    baseline보다 seconds, allocations, memory_mb가 threshold 비율 넘게 늘어난 항목을 찾음.
+    SUITE_MIN_TIME보다 짧게 잰 시간과 SUITE_MEMORY_SLACK_MB보다 작은 메모리 증가는
+    잡음으로 보고 비교하지 않음.
+    :return: regression 이름의 list
+    """
+    regressions = []
+    for name in sorted(results):
+        result = results[name]
+        if name not in baseline:
+            print '%-24s %10.3f ms  (new)' % (name, result['seconds'] * 1e3)
+            continue
+        marks = []
+        for key in ('seconds', 'allocations', 'memory_mb'):
+            old, new = baseline[name].get(key), result[key]
+            if not old:
+                continue
+            if key == 'seconds' and new * result['number'] < SUITE_MIN_TIME:
+                continue
+            if key == 'memory_mb' and new - old < SUITE_MEMORY_SLACK_MB:
+                continue
+            if float(new) / old > 1 + threshold:
+                marks.append('%s +%.1f%%' % (key, (float(new) / old - 1) * 100))
+        print '%-24s %10.3f ms  -> %10.3f ms  %s' % (
+            name, baseline[name]['seconds'] * 1e3, result['seconds'] * 1e3,
+            'REGRESSION ' + ', '.join(marks) if marks else 'ok')
+        if marks:
+            regressions.append(name)
+    return regressions
+
+
+def bench_suite(engines='tree,closure,vm,tiered', repeat='5', json=None, baseline=None,
+                threshold='0.10'):
+    """
+    표준 benchmark 묶음. 옵션은 명령행의 --이름=값으로 받음.
+    --json=FILE: 결과 저장, --baseline=FILE: 저장한 결과와 비교, --threshold=비율
+    :return: baseline보다 느려진 항목 이름의 list
+    """
+    results = run_suite(engines.split(','), int(repeat))
+    for name in sorted(results):
+        result = results[name]
+        print '%-24s %10.3f ms %10d allocations %8.1f MB  %s' % (
+            name, result['seconds'] * 1e3, result['allocations'], result['memory_mb'],
+            result.get('result', ''))
+    print '%-24s %10.1f MB' % ('max rss', max_rss_mb())
+    if json is not None:
+        with open(json, 'w') as result_file:
+            json_module.dump({'max_rss_mb': max_rss_mb(), 'results': results}, result_file,
+                             indent=2, sort_keys=True)
+    if baseline is None:
+        return []
+    with open(baseline) as baseline_file:
+        stored = json_module.load(baseline_file)['results']
+    print 'baseline %s, threshold %s' % (baseline, threshold)
+    return compare_results(results, stored, float(threshold))
+
+
+BENCHMARKS = [
+    ('dispatch', bench_dispatch),
+    ('engines', bench_engines),
+    ('bytecode', bench_bytecode),
+    ('globals', bench_globals),
+    ('tail', bench_tail_calls),
+    ('scanner', bench_scanner),
+    ('loader', bench_loader),
+    ('parser', bench_parser),
+    ('nodes', bench_nodes),
+    ('pairs', bench_pairs),
+    ('callcache', bench_call_cache),
+    ('optimizer', bench_optimizer),
+    ('optimizer-check', check_optimizer),
+    ('memo', bench_memo),
+    ('profiler', bench_profiler),
+    ('tiered', bench_tiered),
+    ('jit-check', check_jit),
+    ('serializer', bench_serializer),
+    ('vectors', bench_vectors),
+    ('streams', bench_streams),
+    ('tables', bench_tables),
+    ('cache', bench_program_cache),
+    ('interpreters', bench_interpreters),
+    ('batch', bench_batch),
+    ('server', bench_server),
+    ('suite', bench_suite),
+]
+
+
+def main(argv):
+    # --이름=값 옵션은 suite에만 넘김
+    options = dict(arg[2:].split('=', 1) for arg in argv if arg.startswith('--'))
+    names = [arg for arg in argv if not arg.startswith('--')] or [name for name, _ in BENCHMARKS]
+    table = dict(BENCHMARKS)
+    failed = False
+    for name in names:
+        if name == 'suite':
+            failed = bool(table[name](**options)) or failed
+        else:
+            # optimizer-check처럼 실패 목록을 돌려주는 것은 실패가 있으면 종료 코드 1
+            failed = bool(table[name]()) or failed
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))